@@ -2,25 +2,16 @@ import streamlit as st
 from io import BytesIO
 from embedchain import App
 from utils import *
+from document_viewer import display_document, document_preview
+from tenant_documents import TenantDocumentContext
 from openai import OpenAI
 
 client = OpenAI()
-from chardet.universaldetector import UniversalDetector
 from streamlit_authenticator import Authenticate
 import re
 
 st.set_page_config(page_title="ViviCheck.ai", page_icon=":house", layout="centered", initial_sidebar_state="auto", menu_items=None)
 
-def detect_file_encoding(file_path):
-    detector = UniversalDetector()
-    with open(file_path, 'rb') as f:
-        for line in f:
-            detector.feed(line)
-            if detector.done:
-                break
-        detector.close()
-    return detector.result['encoding']
-
 def main(authenticator):
 
     st.sidebar.title("Welcome to YourHome.ai")
@@ -35,8 +26,9 @@ def main(authenticator):
             # Realtor Listing Creation Section
             st.subheader("Create Upload Portal")
             address = st.text_input("Enter the address for the listing:", key='create_listing_address')
+            rent = st.number_input("Monthly rent:", min_value=0.0, step=50.0, key='create_listing_rent')
             if st.button("Create Listing", key='create_listing_button'):
-                save_listing(address)
+                save_listing(address, rent if rent > 0 else None)
                 st.success(f"Listing for {address} created successfully!")
 
             # Analyze Candidates for an Address Section
@@ -51,36 +43,32 @@ def main(authenticator):
             selected_tenant = st.selectbox("Select a tenant:", [t.replace('_', ' ') for t in tenants], key='select_tenant')
             selected_tenant = selected_tenant.replace(' ', '_') if selected_tenant != None else None
 
-            # List documents for the selected tenants
-            file_names, files = list_files_for_tenant(selected_address, selected_tenant)
-            meta_datas = []
-            doc_types = []
-
-            # Extract document categories
-            document_categories = set()
-            for file in files:
-                metadata = get_metadata_for_file(file['Key'])
-                meta_datas.append(metadata)
-                document_type = metadata.get('document_type', '').lower()
-                doc_types.append(document_type)
-                document_categories.add(document_type)
-
-            document_categories = list(document_categories)
+            # One listing pass pairs every document with its extracted text; bodies are fetched once per session
+            context = TenantDocumentContext(selected_address, selected_tenant)
+            document_categories = context.categories()
             selected_category = st.selectbox("Select a document to view:", document_categories, key='select_document')
 
             # Fetch the corresponding document for the selected category
-            selected_file = next((file for i, file in enumerate(file_names) if selected_category in doc_types[i]), None)
+            document = context.document_for_category(selected_category)
+            selected_object = document['original'] if document else None
+            selected_file = selected_object['Key'] if selected_object else None
+            if selected_object is not None:
+                # Previews come from the thumbnail cache; the full document is only fetched by the viewer
+                preview = document_preview(selected_file, selected_object.get('ETag', ''), determine_data_type(selected_file),
+                                           size=selected_object.get('Size'))
+                if preview is not None:
+                    st.image(preview, width=200)
             if st.button("Analyze Document", key='analyze_document_button'):
+                st.session_state['analyzed_document'] = selected_file
+            # The viewer has its own widgets, so keep showing the analyzed document across reruns
+            if selected_file and st.session_state.get('analyzed_document') == selected_file:
                 file_key = selected_file
-                file_data = download_file_from_s3(BUCKET_NAME, file_key)
                 file_type = determine_data_type(selected_file)
 
-                if file_type == "pdf_file":
-                    display_pdf(file_data)
-                elif file_type == "image":
-                    st.image(file_data)
+                if file_type in ("pdf_file", "image"):
+                    display_document(file_key, file_type, selected_object.get('ETag', ''), size=selected_object.get('Size'))
                 elif file_type == "text":
-                    content = file_data.decode("utf-8")
+                    content = decode_document(context.body(selected_object), selected_object.get('ETag'))
                     if "youtube.com" in content or "youtu.be" in content:
                         st.video(content)
                     else:
@@ -91,33 +79,20 @@ def main(authenticator):
                     st.write(f"[Click here to view/download {selected_file}]({presigned_url})")
 
                 st.markdown("### Evaluation")
-                files = get_files_for_tenant(selected_address, selected_tenant, only_text=True)
-                file = [file for file in files if file_type.lower() in file['Key'].lower()]
-                for file in files:
-                    meta_data = get_metadata_for_file(BUCKET_NAME, file['Key'])
-                    doc_type = meta_data.get('document_type', '').lower()
-                    if selected_category.lower() in doc_type:
-                        break
-                doc_type = doc_type.replace('_', ' ')
-
-                presigned_url = generate_presigned_url(BUCKET_NAME, file['Key'])
-                st.markdown(presigned_url)
-                local_file_path = download_from_presigned_url(presigned_url)
-                file_encoding = detect_file_encoding(local_file_path)
-                with open(local_file_path, 'r', encoding=file_encoding) as f:
-                    file_content = f.read()
+                doc_type = document['document_type'].replace('_', ' ')
+                file_content = context.text(document)
+                if file_content is None:
+                    st.warning("The text of this document has not been extracted yet.")
+                    return
 
                 name = selected_tenant.replace('_', ' ')
                 address = selected_address
-                response = client.chat.completions.create(
-                    model="gpt-3.5-turbo-0125",
-                    messages=[
-                        {'role': 'system', 'content': f'You are a critical property manager and are currently evaluating a prospective tenant named {name} for a rental property located at {address}. Your goal is to evaluate the tenant and determine whether they are a good fit for the property. Pay close attention to key metrics like credit score, income level and job stability. Be highly suspect of any red flags.'},
-                        {"role": "user", "content": f"Based on the following document from {name} with document type {doc_type}, provide concise meaningful commentary on whether {name} is a good fit for the property.\n ```{file_content}```"}
-                    ],
+                response_text = complete_document_prompt(
+                    f'You are a critical property manager and are currently evaluating a prospective tenant named {name} for a rental property located at {address}. Your goal is to evaluate the tenant and determine whether they are a good fit for the property. Pay close attention to key metrics like credit score, income level and job stability. Be highly suspect of any red flags.',
+                    f"Based on the following document from {name} with document type {doc_type}, provide concise meaningful commentary on whether {name} is a good fit for the property.\n ",
+                    file_content,
                     temperature=0.0
                 )
-                response_text = response.choices[0].message.content
                 response_text = response_text.replace('*', '\*').replace('_', '\_').replace('\xa0', ' ').replace('$', '\$')
                 st.markdown(response_text)
         else:
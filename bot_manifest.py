@@ -0,0 +1,47 @@
+import os
+import time
+from local_store import LOCAL_STORE_PATH, LocalStore
+
+BOT_MANIFEST_PATH = os.environ.get('BOT_MANIFEST_PATH', LOCAL_STORE_PATH)
+
+
+class BotManifest(LocalStore):
+    """
+    Record of which S3 objects (and which version of them, by ETag) are embedded in each tenant collection
+    of the Chroma store, along with the embedchain source hash needed to remove their chunks again.
+    """
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS embedded ("
+        "collection TEXT NOT NULL, s3_key TEXT NOT NULL, etag TEXT NOT NULL, source_hash TEXT NOT NULL, "
+        "embedded REAL NOT NULL, PRIMARY KEY (collection, s3_key))",
+    )
+
+    def __init__(self, path: str=BOT_MANIFEST_PATH):
+        """
+        Create a new instance of "BotManifest".
+
+        Parameters
+        ----------
+        path: str
+            Location of the SQLite file holding the manifest.
+        """
+        super().__init__(path)
+
+    def entries(self, collection: str) -> dict:
+        """Return {s3_key: (etag, source_hash)} for everything embedded in collection"""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT s3_key, etag, source_hash FROM embedded WHERE collection = ?", (collection,)).fetchall()
+        return {s3_key: (etag, source_hash) for s3_key, etag, source_hash in rows}
+
+    def put(self, collection: str, s3_key: str, etag: str, source_hash: str):
+        """Record that a version of an S3 object is embedded in collection"""
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO embedded (collection, s3_key, etag, source_hash, embedded) VALUES (?, ?, ?, ?, ?)",
+                (collection, s3_key, etag, source_hash, time.time()))
+
+    def remove(self, collection: str, s3_key: str):
+        """Forget an S3 object that is no longer embedded in collection"""
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM embedded WHERE collection = ? AND s3_key = ?", (collection, s3_key))
@@ -0,0 +1,72 @@
+import os
+import hashlib
+
+# Chunking and batching of tenant documents before they are written to a Chroma collection
+CHUNK_SIZE = int(os.environ.get('CHUNK_SIZE', 1000))
+CHUNK_OVERLAP = int(os.environ.get('CHUNK_OVERLAP', 200))
+EMBEDDING_BATCH_SIZE = int(os.environ.get('EMBEDDING_BATCH_SIZE', 256))
+CHROMA_WRITE_BATCH_SIZE = int(os.environ.get('CHROMA_WRITE_BATCH_SIZE', 1000))
+
+
+def chunk_text(text, chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
+    """Split text into chunks of at most chunk_size characters that overlap by about overlap characters, cutting at whitespace where possible"""
+    if overlap >= chunk_size:
+        raise ValueError("Chunk overlap must be smaller than the chunk size")
+    text = text.strip()
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(start + chunk_size, len(text))
+        if end < len(text):
+            # Cut at the last space that still lets the next chunk start after this one
+            boundary = text.rfind(' ', start + overlap + 1, end)
+            if boundary != -1:
+                end = boundary
+        chunk = text[start:end].strip()
+        if chunk:
+            chunks.append(chunk)
+        if end >= len(text):
+            break
+        start = end - overlap
+    return chunks
+
+def document_source_hash(s3_key, etag):
+    """Identifier shared by every chunk of one version of an S3 document, used to delete them together"""
+    return hashlib.md5(f"{s3_key}:{etag}".encode('utf-8')).hexdigest()
+
+def ingest_documents(collection, documents, embed, app_id=None, chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP,
+                     batch_size=EMBEDDING_BATCH_SIZE, write_batch_size=CHROMA_WRITE_BATCH_SIZE):
+    """
+    Chunk, embed and store a batch of documents in a Chroma collection.
+
+    documents is a list of dicts with 's3_key', 'etag', 'data_type' and 'texts', a dict mapping a kind of text
+    (e.g. 'summary' or 'text') to its content. Chunks of all documents are embedded batch_size at a time with
+    embed(list of str) -> list of vectors, and written write_batch_size at a time.
+    Returns {s3_key: source_hash} for every document, including those whose texts are empty and produced
+    no chunks, so callers can record them as ingested.
+    """
+    ids, chunks, metadatas = [], [], []
+    source_hashes = {}
+    for document in documents:
+        source_hash = document_source_hash(document['s3_key'], document['etag'])
+        source_hashes[document['s3_key']] = source_hash
+        for kind, text in document['texts'].items():
+            for index, chunk in enumerate(chunk_text(text or '', chunk_size, overlap)):
+                metadata = {'hash': source_hash, 'url': document['s3_key'], 'data_type': document['data_type'], 'kind': kind}
+                if app_id is not None:
+                    metadata['app_id'] = app_id
+                ids.append(f"{source_hash}-{kind}-{index}")
+                chunks.append(chunk)
+                metadatas.append(metadata)
+    if not chunks:
+        return source_hashes
+
+    embeddings = []
+    for start in range(0, len(chunks), batch_size):
+        embeddings.extend(embed(chunks[start:start + batch_size]))
+
+    for start in range(0, len(ids), write_batch_size):
+        end = start + write_batch_size
+        collection.upsert(ids=ids[start:end], embeddings=embeddings[start:end],
+                          documents=chunks[start:end], metadatas=metadatas[start:end])
+    return source_hashes
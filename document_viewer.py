@@ -0,0 +1,242 @@
+import io
+import os
+import threading
+from collections import OrderedDict
+import streamlit as st
+import pypdfium2 as pdfium
+from PIL import Image
+from utils import s3, BUCKET_NAME, read_document_bytes
+from thumbnail_cache import ThumbnailCache
+
+# Presigned viewer links are short-lived; the browser fetches the document straight from S3
+VIEWER_URL_EXPIRATION = int(os.environ.get('VIEWER_URL_EXPIRATION', 300))
+# Ranged reads fetch the document in blocks of this size and keep at most RANGE_CACHE_BLOCKS of them
+RANGE_BLOCK_SIZE = int(os.environ.get('RANGE_BLOCK_SIZE', 256 * 1024))
+RANGE_CACHE_BLOCKS = int(os.environ.get('RANGE_CACHE_BLOCKS', 64))
+THUMBNAIL_SCALE = float(os.environ.get('THUMBNAIL_SCALE', 0.3))
+THUMBNAILS_PER_PAGE = int(os.environ.get('THUMBNAILS_PER_PAGE', 6))
+# Longest side of image thumbnails, in pixels
+THUMBNAIL_MAX_SIZE = int(os.environ.get('THUMBNAIL_MAX_SIZE', 400))
+
+# Page thumbnails, rendered once per S3 ETag and shared by every session
+thumbnail_cache = ThumbnailCache()
+# PDFium is not thread-safe, even across documents, and every Streamlit session runs on its own thread:
+# everything from opening a PDF to closing it happens under this lock
+pdfium_lock = threading.RLock()
+
+CONTENT_TYPES = {
+    '.pdf': 'application/pdf',
+    '.png': 'image/png',
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.txt': 'text/plain; charset=utf-8',
+}
+
+
+class S3RangeReader(io.RawIOBase):
+    """
+    Read-only, seekable file object over an S3 object that fetches only the byte ranges that are read.
+    Blocks are kept in a small LRU cache, so a PDF reader can jump between its trailer, cross-reference
+    table and page objects without downloading the whole document.
+    """
+    def __init__(self, key: str, size: int=None, block_size: int=RANGE_BLOCK_SIZE, max_blocks: int=RANGE_CACHE_BLOCKS):
+        """
+        Create a new instance of "S3RangeReader".
+
+        Parameters
+        ----------
+        key: str
+            Key of the object in the bucket.
+        size: int
+            Length of the object in bytes; looked up with a HEAD request when not given.
+        block_size: int
+            Number of bytes fetched per ranged GET.
+        max_blocks: int
+            Maximum number of blocks kept in memory.
+        """
+        super().__init__()
+        self.key = key
+        self.size = size if size is not None else s3.head_object(Bucket=BUCKET_NAME, Key=key)['ContentLength']
+        self.block_size = block_size
+        self.max_blocks = max_blocks
+        self.requests = 0
+        self._position = 0
+        self._blocks = OrderedDict()
+        self._lock = threading.Lock()
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int=io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = self.size + offset
+        else:
+            raise ValueError(f"Invalid whence {whence}")
+        if position < 0:
+            raise ValueError("Negative seek position")
+        self._position = position
+        return position
+
+    def _block(self, index: int) -> bytes:
+        """Return one block of the object, fetching it with a ranged GET on a cache miss"""
+        with self._lock:
+            if index in self._blocks:
+                self._blocks.move_to_end(index)
+                return self._blocks[index]
+        start = index * self.block_size
+        end = min(start + self.block_size, self.size) - 1
+        response = s3.get_object(Bucket=BUCKET_NAME, Key=self.key, Range=f"bytes={start}-{end}")
+        data = response['Body'].read()
+        with self._lock:
+            self.requests += 1
+            self._blocks[index] = data
+            while len(self._blocks) > self.max_blocks:
+                self._blocks.popitem(last=False)
+        return data
+
+    def readinto(self, buffer) -> int:
+        view = memoryview(buffer).cast('B')
+        wanted = min(len(view), max(self.size - self._position, 0))
+        written = 0
+        while written < wanted:
+            index, offset = divmod(self._position, self.block_size)
+            block = self._block(index)
+            count = min(len(block) - offset, wanted - written)
+            view[written:written + count] = block[offset:offset + count]
+            written += count
+            self._position += count
+        return written
+
+
+def presigned_view_url(key, expiration=VIEWER_URL_EXPIRATION):
+    """Short-lived URL that makes the browser display an S3 object inline instead of downloading it"""
+    content_type = CONTENT_TYPES.get(os.path.splitext(key)[1].lower(), 'application/octet-stream')
+    return s3.generate_presigned_url(
+        'get_object',
+        Params={
+            'Bucket': BUCKET_NAME,
+            'Key': key,
+            'ResponseContentType': content_type,
+            'ResponseContentDisposition': 'inline',
+        },
+        ExpiresIn=expiration)
+
+def open_pdf(key, size=None):
+    """Open a PDF in S3 with pypdfium2, reading only the byte ranges pdfium asks for; hold pdfium_lock while using it"""
+    with pdfium_lock:
+        return pdfium.PdfDocument(S3RangeReader(key, size), autoclose=True)
+
+def _jpeg_bytes(image):
+    """Encode a PIL image as a compact JPEG"""
+    buffer = io.BytesIO()
+    image.convert('RGB').save(buffer, format='jpeg', quality=70, optimize=True)
+    return buffer.getvalue()
+
+def render_pdf_thumbnails(pdf, first_page=0, count=THUMBNAILS_PER_PAGE, scale=THUMBNAIL_SCALE):
+    """Render count pages of an open PDF, starting at first_page, to small PIL images"""
+    images = []
+    with pdfium_lock:
+        for index in range(first_page, min(first_page + count, len(pdf))):
+            page = pdf[index]
+            try:
+                bitmap = page.render(scale=scale)
+                # Copied out of the bitmap buffer, so the bitmap is freed here and not by a finalizer on another thread
+                images.append(bitmap.to_pil().copy())
+                bitmap.close()
+            finally:
+                page.close()
+    return images
+
+def pdf_thumbnails(key, etag, first_page=0, count=THUMBNAILS_PER_PAGE, size=None):
+    """
+    Return (page_count, thumbnails) for count pages of a PDF starting at first_page, as JPEG bytes.
+    The PDF is only opened (with ranged reads) when a page or the page count is not cached for this ETag.
+    """
+    page_count = thumbnail_cache.page_count(key, etag)
+    if page_count is not None:
+        pages = range(first_page, min(first_page + count, page_count))
+        cached = [thumbnail_cache.get(key, etag, page) for page in pages]
+        if all(data is not None for data in cached):
+            return page_count, cached
+
+    with pdfium_lock:
+        pdf = open_pdf(key, size)
+        try:
+            page_count = len(pdf)
+            pages = range(first_page, min(first_page + count, page_count))
+            thumbnails = [thumbnail_cache.get(key, etag, page) for page in pages]
+            images = {offset: render_pdf_thumbnails(pdf, page, 1)[0]
+                      for offset, page in enumerate(pages) if thumbnails[offset] is None}
+        finally:
+            pdf.close()
+    # Encoding and caching the rendered pages needs no pdfium, so other sessions can render meanwhile
+    thumbnail_cache.set_page_count(key, etag, page_count)
+    for offset, image in images.items():
+        thumbnails[offset] = _jpeg_bytes(image)
+        thumbnail_cache.put(key, etag, pages[offset], thumbnails[offset])
+    return page_count, thumbnails
+
+def image_thumbnail(key, etag):
+    """Return a thumbnail of an image document as JPEG bytes, downloading the image only on a cache miss"""
+    data = thumbnail_cache.get(key, etag, 0)
+    if data is None:
+        image = Image.open(io.BytesIO(read_document_bytes(key)))
+        image.thumbnail((THUMBNAIL_MAX_SIZE, THUMBNAIL_MAX_SIZE))
+        data = _jpeg_bytes(image)
+        thumbnail_cache.put(key, etag, 0, data)
+    return data
+
+def document_preview(key, etag, file_type, size=None):
+    """Return a thumbnail of the first page of a PDF or image document, or None for other file types"""
+    if file_type == "pdf_file":
+        _, thumbnails = pdf_thumbnails(key, etag, 0, 1, size)
+        return thumbnails[0] if thumbnails else None
+    if file_type == "image":
+        return image_thumbnail(key, etag)
+    return None
+
+def display_pdf_thumbnails(key, etag, size=None, key_prefix='viewer'):
+    """Show a PDF as a grid of cached page thumbnails, rendering only uncached pages currently in view"""
+    page_count = thumbnail_cache.page_count(key, etag)
+    first_page = 0
+    if page_count is None or page_count > THUMBNAILS_PER_PAGE:
+        start = st.number_input("First page:" if page_count is None else f"First page (of {page_count}):",
+                                min_value=1, max_value=page_count, value=1, step=THUMBNAILS_PER_PAGE,
+                                key=f"{key_prefix}_first_page")
+        first_page = int(start) - 1
+    page_count, thumbnails = pdf_thumbnails(key, etag, first_page, THUMBNAILS_PER_PAGE, size)
+    columns = st.columns(3)
+    for offset, data in enumerate(thumbnails):
+        columns[offset % 3].image(data, caption=f"Page {first_page + offset + 1}", use_column_width=True)
+
+def display_document(key, file_type, etag, size=None, key_prefix='viewer'):
+    """
+    Show an S3 document without proxying it through the app: PDFs are browsed as cached page thumbnails,
+    and the full-resolution PDF or image is only loaded, by the browser from a presigned URL, on demand.
+    Returns False when the file type cannot be viewed inline.
+    """
+    if file_type == "pdf_file":
+        mode = st.radio("View as:", ["Page thumbnails", "Full document"], horizontal=True, key=f"{key_prefix}_mode")
+        if mode == "Page thumbnails":
+            display_pdf_thumbnails(key, etag, size, key_prefix)
+        else:
+            url = presigned_view_url(key)
+            st.markdown(f'<iframe src="{url}" width="800" height="800" type="application/pdf"></iframe>', unsafe_allow_html=True)
+        st.markdown(f"[Open in a new tab]({presigned_view_url(key)})")
+        return True
+    if file_type == "image":
+        st.image(image_thumbnail(key, etag))
+        if st.checkbox("Show full resolution", key=f"{key_prefix}_full_resolution"):
+            st.image(presigned_view_url(key))
+        return True
+    return False
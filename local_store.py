@@ -0,0 +1,49 @@
+import os
+import sqlite3
+import threading
+
+# Every local store lives in this one SQLite file, unless its own path variable points somewhere else
+LOCAL_STORE_PATH = os.environ.get('LOCAL_STORE_PATH', os.path.join('db', 'local_store.sqlite3'))
+
+# Absolute path -> (connection, lock) of every SQLite file opened by this process
+_databases = {}
+_databases_lock = threading.Lock()
+
+
+def open_database(path=LOCAL_STORE_PATH):
+    """Return the (connection, lock) shared by every store kept in the SQLite file at path"""
+    key = os.path.abspath(path)
+    with _databases_lock:
+        if key not in _databases:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(path, check_same_thread=False)
+            # Readers in other processes (e.g. the precompute job) don't block on the app's writes
+            connection.execute("PRAGMA journal_mode=WAL")
+            _databases[key] = (connection, threading.RLock())
+        return _databases[key]
+
+
+class LocalStore:
+    """
+    Base of the SQLite-backed stores under db/.
+    Stores kept in the same file share one connection, and every statement runs under that connection's lock,
+    so the stores can be used from any Streamlit session thread. Subclasses list their tables in SCHEMA.
+    """
+    SCHEMA = ()
+
+    def __init__(self, path: str=LOCAL_STORE_PATH):
+        """
+        Create a new instance of "LocalStore".
+
+        Parameters
+        ----------
+        path: str
+            Location of the SQLite file holding the store.
+        """
+        self.path = path
+        self._connection, self._lock = open_database(path)
+        with self._lock, self._connection:
+            for statement in self.SCHEMA:
+                self._connection.execute(statement)
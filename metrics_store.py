@@ -0,0 +1,164 @@
+import os
+import time
+import json
+import pandas as pd
+from local_store import LOCAL_STORE_PATH, LocalStore
+
+METRICS_STORE_PATH = os.environ.get('METRICS_STORE_PATH', LOCAL_STORE_PATH)
+
+# Columns of a listing's metrics frame, in order
+METRIC_COLUMNS = ['address', 'tenant', 'credit_score', 'monthly_income', 'references_note', 'rent', 'updated']
+# Columns of the portfolio frame, in order
+PORTFOLIO_COLUMNS = ['address', 'tenant', 'documents', 'document_types', 'credit_score', 'monthly_income', 'references_note', 'rent']
+
+
+class MetricsStore(LocalStore):
+    """
+    Local store of structured tenant metrics, indexed by listing and tenant, and of each listing's rent.
+    Each tenant row remembers the fingerprint of the documents its metrics were extracted from.
+    """
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS listings (address TEXT PRIMARY KEY, rent REAL, updated REAL NOT NULL)",
+        "CREATE TABLE IF NOT EXISTS tenant_metrics ("
+        "address TEXT NOT NULL, tenant TEXT NOT NULL, credit_score REAL, monthly_income REAL, "
+        "references_note TEXT, fingerprint TEXT NOT NULL, updated REAL NOT NULL, PRIMARY KEY (address, tenant))",
+        "CREATE TABLE IF NOT EXISTS tenant_documents ("
+        "address TEXT NOT NULL, tenant TEXT NOT NULL, documents INTEGER NOT NULL, document_types TEXT NOT NULL, "
+        "fingerprint TEXT NOT NULL, updated REAL NOT NULL, PRIMARY KEY (address, tenant))",
+    )
+
+    def __init__(self, path: str=METRICS_STORE_PATH):
+        """
+        Create a new instance of "MetricsStore".
+
+        Parameters
+        ----------
+        path: str
+            Location of the SQLite file holding the metrics.
+        """
+        super().__init__(path)
+
+    def set_rent(self, address: str, rent: float):
+        """Store the monthly rent of a listing"""
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO listings (address, rent, updated) VALUES (?, ?, ?)", (address, rent, time.time()))
+
+    def add_listing(self, address: str):
+        """Record a listing without touching its rent"""
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR IGNORE INTO listings (address, rent, updated) VALUES (?, NULL, ?)", (address, time.time()))
+
+    def listings(self) -> list:
+        """Return every recorded listing"""
+        with self._lock:
+            rows = self._connection.execute("SELECT address FROM listings ORDER BY address").fetchall()
+        return [row[0] for row in rows]
+
+    def remove_listing(self, address: str):
+        """Forget a listing that no longer exists, along with its tenants"""
+        with self._lock, self._connection:
+            for table in ('listings', 'tenant_metrics', 'tenant_documents'):
+                self._connection.execute(f"DELETE FROM {table} WHERE address = ?", (address,))
+
+    def rent(self, address: str):
+        """Return the monthly rent of a listing, or None if it was never set"""
+        with self._lock:
+            row = self._connection.execute("SELECT rent FROM listings WHERE address = ?", (address,)).fetchone()
+        return row[0] if row else None
+
+    def fingerprint(self, address: str, tenant: str):
+        """Return the fingerprint the stored metrics of a tenant were extracted from, or None"""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT fingerprint FROM tenant_metrics WHERE address = ? AND tenant = ?", (address, tenant)).fetchone()
+        return row[0] if row else None
+
+    def put(self, address: str, tenant: str, fingerprint: str, metrics: dict):
+        """Store (or replace) the metrics of a tenant; missing metrics are stored as NULL"""
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO tenant_metrics "
+                "(address, tenant, credit_score, monthly_income, references_note, fingerprint, updated) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (address, tenant, metrics.get('credit_score'), metrics.get('monthly_income'),
+                 metrics.get('references_note'), fingerprint, time.time()))
+
+    def remove(self, address: str, tenant: str):
+        """Forget a tenant who no longer has documents for a listing"""
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM tenant_metrics WHERE address = ? AND tenant = ?", (address, tenant))
+            self._connection.execute("DELETE FROM tenant_documents WHERE address = ? AND tenant = ?", (address, tenant))
+
+    def metric_fingerprints(self) -> dict:
+        """Return {(address, tenant): fingerprint} of the stored metrics"""
+        with self._lock:
+            rows = self._connection.execute("SELECT address, tenant, fingerprint FROM tenant_metrics").fetchall()
+        return {(address, tenant): fingerprint for address, tenant, fingerprint in rows}
+
+    def document_fingerprints(self) -> dict:
+        """Return {(address, tenant): fingerprint} of the stored document aggregates"""
+        with self._lock:
+            rows = self._connection.execute("SELECT address, tenant, fingerprint FROM tenant_documents").fetchall()
+        return {(address, tenant): fingerprint for address, tenant, fingerprint in rows}
+
+    def put_documents(self, address: str, tenant: str, fingerprint: str, documents: int, document_types: list):
+        """Store (or replace) the document count and document types of a tenant"""
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO tenant_documents (address, tenant, documents, document_types, fingerprint, updated) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (address, tenant, documents, json.dumps(sorted(document_types)), fingerprint, time.time()))
+
+    def tenants(self, address: str) -> list:
+        """Return the tenants with stored metrics for a listing"""
+        with self._lock:
+            rows = self._connection.execute("SELECT tenant FROM tenant_metrics WHERE address = ?", (address,)).fetchall()
+        return [row[0] for row in rows]
+
+    def listing_metrics(self, address: str=None) -> pd.DataFrame:
+        """
+        Load the metrics of every tenant of a listing, joined with the listing's rent, in one query.
+
+        Parameters
+        ----------
+        address: str
+            Listing to load, or None to load every listing.
+
+        Returns
+        -------
+        pd.DataFrame
+            One row per tenant with the columns in METRIC_COLUMNS.
+        """
+        query = (
+            "SELECT m.address, m.tenant, m.credit_score, m.monthly_income, m.references_note, l.rent, m.updated "
+            "FROM tenant_metrics m LEFT JOIN listings l ON l.address = m.address"
+        )
+        params = ()
+        if address is not None:
+            query += " WHERE m.address = ?"
+            params = (address,)
+        with self._lock:
+            rows = self._connection.execute(query + " ORDER BY m.address, m.tenant", params).fetchall()
+        return pd.DataFrame(rows, columns=METRIC_COLUMNS)
+
+    def portfolio(self) -> pd.DataFrame:
+        """
+        Load the document aggregates of every tenant of every listing, joined with their metrics and listing rent.
+
+        Returns
+        -------
+        pd.DataFrame
+            One row per tenant with the columns in PORTFOLIO_COLUMNS; document_types is a list of str.
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT d.address, d.tenant, d.documents, d.document_types, m.credit_score, m.monthly_income, "
+                "m.references_note, l.rent FROM tenant_documents d "
+                "LEFT JOIN tenant_metrics m ON m.address = d.address AND m.tenant = d.tenant "
+                "LEFT JOIN listings l ON l.address = d.address ORDER BY d.address, d.tenant"
+            ).fetchall()
+        frame = pd.DataFrame(rows, columns=PORTFOLIO_COLUMNS)
+        frame['document_types'] = frame['document_types'].map(json.loads)
+        return frame
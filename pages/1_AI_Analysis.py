@@ -2,22 +2,15 @@ import streamlit as st
 from io import BytesIO
 from embedchain import App
 from utils import *
+from tenant_report import (ReportStore, iter_document_analyses, build_report_input, stream_tenant_report,
+                           escape_markdown, tenant_fingerprint)
 import openai
 
-from chardet.universaldetector import UniversalDetector
 from streamlit_authenticator import Authenticate
-import re
 
-def detect_file_encoding(file_path):
-    # Function to detect file encoding
-    detector = UniversalDetector()
-    with open(file_path, 'rb') as f:
-        for line in f:
-            detector.feed(line)
-            if detector.done:
-                break
-        detector.close()
-    return detector.result['encoding']
+@st.cache_resource
+def get_report_store():
+    return ReportStore()
 
 def main():
     st.title('Analizador de inquilino')
@@ -42,90 +35,34 @@ def main():
             address = selected_address
 
             if st.button("Informe de inquilino"):
-                files = get_files_for_tenant(selected_address, selected_tenant.replace(' ', '_'), only_text=True)
-                responses = ''
-                for file in files:
-                    metadata = get_metadata_for_file(file['Key'])
-                    document_type = metadata.get('document_type', '').lower()
-                    presigned_url = generate_presigned_url(BUCKET_NAME, file['Key'])
-                    local_file_path = download_from_presigned_url(presigned_url)
-                    file_encoding = detect_file_encoding(local_file_path)
-                    with open(local_file_path, 'r', encoding=file_encoding) as f:
-                        file_content = f.read()
-                    file_content = re.sub(r'([a-zA-Z0-9])([a-zA-Z0-9])', r'\1 \2', file_content)
-                    response = client.chat.completions.create(
-                        model="gpt-3.5-turbo-0125",
-                        messages=[
-                            {
-                                'role': 'system',
-                                'content': (
-                                    'You work for a detail-oriented property manager and are currently '
-                                    'evaluating a prospective tenant. Your goal is to evaluate the tenant and '
-                                    'determine whether they are a good fit for the property based only on the '
-                                    'document provided. Pay close attention to key metrics like credit score, '
-                                    'income level, and job stability. Be highly suspect of any red flags.'
-                                )
-                            },
-                            {
-                                'role': 'user',
-                                'content': (
-                                    f"Based on the following document from {name} with document type {document_type}, "
-                                    "provide a concise summary of all meaningful aspects of the document for your "
-                                    "manager"
-                                    f"The information you provide should help to determine whether {name} is a good fit "
-                                    "as a tenant. Finally, provide commentary on whether you believe this tenant is "
-                                    "a strong candidate.\n\n"
-                                    f"```{file_content}```"
-                                )
-                            }
-                        ],
-                        temperature=0.1
-                    )
+                tenant_name = selected_tenant.replace(' ', '_')
+                files = get_files_for_tenant(selected_address, tenant_name, only_text=True)
+                fingerprint = tenant_fingerprint(files)
+                report_store = get_report_store()
+                stored = report_store.get(selected_address, tenant_name, fingerprint)
+                if stored is not None:
+                    # Precomputed by precompute_reports.py and the documents have not changed since
+                    analyses, report = stored
+                    for document_type, analysis in analyses:
+                        with st.expander(f"Documento: {document_type}"):
+                            st.markdown(analysis)
+                    st.markdown(escape_markdown(report, escape_asterisks=False))
+                    return
 
-                    response_text =  response.choices[0].message.content
-                    response_text = response_text.replace('*', '\*').replace('_', '\_')
-                    response_text = response_text.replace('\xa0', ' ')
-                    response_text = response_text.replace('$', '\$')
-                    responses += (
-                        f"The following is a report analyzing the document provided by {name} "
-                        f"with document type {document_type}:\n\n{response_text}\n"
-                    )
+                # Per-document analyses render as soon as each one finishes
+                analyses = {}
+                for index, document_type, analysis in iter_document_analyses(selected_address, tenant_name, files=files):
+                    analyses[index] = (document_type, analysis)
+                    with st.expander(f"Documento: {document_type}"):
+                        st.markdown(analysis)
 
                 # AI Tenant Evaluation Section
-                response = client.chat.completions.create(
-                    model="gpt-3.5-turbo-0125",
-                    messages=[
-                        {
-                            'role': 'system',
-                            'content': (
-                                'You are a highly detail-oriented property manager and are currently evaluating '
-                                'a prospective tenant. Your goal is to evaluate the tenant and determine whether '
-                                'they are a good fit for the property based on several reports provided to you. '
-                                'Pay close attention to key metrics like credit score, income level, and job '
-                                'stability. Be highly suspect of any red flags.'
-                            )
-                        },
-                        {
-                            'role': 'user',
-                            'content': (
-                                f"You are provided with several key summaries of the documents provided by the "
-                                f"prospective tenant named {name} for a rental property located at {address}. "
-                                "Based on these documents, write the following report with 4 sections in a markdown streamlit compatible format avoidin:\n\n"
-                                "Section 1 (Key Information): A summary of all the information provided to you.\n"
-                                "Section 2 (Numerical Analysis): A summary of the key numerical variables in the documents.\n"
-                                "Section 3 (Tenant Evaluation and Recommendation): A summary of whether you believe this tenant is a strong candidate or not.\n"
-                                "Section 4 (Final Summary): Final bullet point summary of the most important metrics and information from your analysis.\n\n"
-                                f"```{responses}```"
-                            )
-                        }
-                    ],
-                    temperature=0.2
-                )
-                response_text = response.choices[0].message.content
-                response_text = response_text.replace('_', '\_')
-                response_text = response_text.replace('\xa0', ' ')
-                response_text = response_text.replace('$', '\$')
-                st.markdown(response_text)
+                ordered_analyses = [analyses[index] for index in sorted(analyses)]
+                responses = build_report_input(name, ordered_analyses)
+                report_placeholder = st.empty()
+                report = stream_to_placeholder(report_placeholder, stream_tenant_report(name, address, responses),
+                                               transform=lambda text: escape_markdown(text, escape_asterisks=False))
+                report_store.put(selected_address, tenant_name, fingerprint, ordered_analyses, report)
         else:
             st.warning("Please select a tenant to proceed.")
     else:
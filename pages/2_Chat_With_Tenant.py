@@ -3,6 +3,7 @@ import boto3
 from io import BytesIO
 from embedchain import App
 from utils import *
+from tenant_chat import TenantChatEngine
 from streamlit_authenticator import Authenticate
 
 def main():
@@ -35,7 +36,11 @@ def main():
             st.warning("You need to subscribe to access this feature.")
             st.session_state['subscribe_now'] = True  # Set subscription state flag
         else:
-            st.session_state['bot'] = create_bot(selected_address, selected_tenant)
+            st.session_state['bot'] = create_bot(selected_address, selected_tenant.replace(' ', '_'))
+            st.session_state['bot_tenant'] = (selected_address, selected_tenant.replace(' ', '_'))
+            st.session_state['chat_engine'] = TenantChatEngine(
+                st.session_state['bot'], tenant_collection_name(selected_address, selected_tenant.replace(' ', '_')))
+            st.session_state.messages = []
 
         
     # Check if the user needs to subscribe
@@ -46,11 +51,18 @@ def main():
             return
 
     if "bot" in st.session_state:
+        # Pick up documents the tenant uploaded, replaced or removed since the bot was built
+        if st.button("Refresh tenant documents"):
+            bot_address, bot_tenant = st.session_state['bot_tenant']
+            changes = refresh_bot(st.session_state['bot'], bot_address, bot_tenant)
+            st.info(f"{changes['added']} added, {changes['modified']} updated, {changes['deleted']} removed documents.")
+
         # Start Chatbot and Reset Conversation buttons
         reset_chat = st.button("Reset Conversation")
 
         if reset_chat:
             st.session_state.messages = []
+            st.session_state['chat_engine'].reset()
 
         # Chatbot functionality with streaming
         if "messages" not in st.session_state:
@@ -67,12 +79,8 @@ def main():
 
             with st.chat_message("assistant"):
                 message_placeholder = st.empty()
-                full_response = ""
-                responses = st.session_state['bot'].chat(prompt)
-                for chunk in responses:
-                    full_response += chunk
-                    message_placeholder.markdown(full_response + "▌")
-                message_placeholder.markdown(full_response)
+                responses = st.session_state['chat_engine'].stream(prompt)
+                full_response = stream_to_placeholder(message_placeholder, responses)
             st.session_state.messages.append({"role": "assistant", "content": full_response})
 
 
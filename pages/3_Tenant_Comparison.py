@@ -2,85 +2,97 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import sys
-from utils import fetch_created_listings, get_tenants_for_address, get_metadata_for_file, list_files_for_tenant
+from utils import fetch_created_listings, metrics_store
+from tenant_metrics import refresh_listing_metrics
+from tenant_scoring import DEFAULT_WEIGHTS, score_tenants, top_applicants
 
 
-def calculate_rent_to_income(rent, income):
-    """Calculate rent-to-income ratio."""
-    try:
-        income = float(income)
-        if income > 0:
-            return round((rent / income) * 100, 2)
-        return None
-    except (ValueError, TypeError):
-        return None
-    
+# Columns of the ranked table and their display names
+DISPLAY_COLUMNS = {
+    'rank': 'Rank',
+    'address': 'Listing',
+    'tenant': 'Tenant Name',
+    'fit_score': 'Fit Score',
+    'credit_score': 'Credit Score',
+    'credit_bucket': 'Credit Bucket',
+    'monthly_income': 'Monthly Income',
+    'rent_to_income': 'Rent-to-Income Ratio (%)',
+    'references_note': 'References',
+}
 
 def main():
     st.title('Tenant Comparison Dashboard')
 
     # Analyze Candidates for an Address Section
-    st.subheader("Compare Tenants for a Listing")
+    st.subheader("Rank Tenants for a Listing")
     available_listings = fetch_created_listings()  # Changed from fetch_created_listings() to fetch_listings()
     if not available_listings:
         st.warning("No listings available at the moment.")
         return
 
     selected_address = st.selectbox("Select a listing:", available_listings)
-    tenants = get_tenants_for_address(selected_address)
-    if not tenants:
-        st.warning("No tenants available for this listing.")
-        return
 
-    # Tenant selection (multiple)
-    selected_tenants = st.multiselect("Select tenants to compare:", tenants)
-    if not selected_tenants:
-        st.warning("Please select at least two tenants to compare.")
+    # Metrics are extracted once per document version and loaded from the local metrics store
+    metrics = metrics_store.listing_metrics(selected_address)
+    if metrics.empty or st.button("Refresh tenant metrics"):
+        with st.spinner("Extracting tenant metrics..."):
+            _, failed = refresh_listing_metrics(selected_address)
+        if failed:
+            st.warning(f"Could not extract metrics for {', '.join(name.replace('_', ' ') for name in failed)}; "
+                       "they will be retried on the next refresh.")
+        metrics = metrics_store.listing_metrics(selected_address)
+    if metrics.empty:
+        st.warning("No tenants available for this listing.")
         return
 
-    # Initialize DataFrame to store comparison data
-    comparison_data = []
+    stored_rent = metrics_store.rent(selected_address)
+    rent = st.number_input("Monthly rent:", min_value=0.0, step=50.0, value=float(stored_rent or 0.0))
+    if rent > 0 and rent != stored_rent:
+        metrics_store.set_rent(selected_address, rent)
+        metrics['rent'] = rent
 
-    # Fetch and organize data for each tenant
-    for tenant in selected_tenants:
-        tenant_data = {'Tenant Name': tenant.replace('_', ' ')}
-        file_names, files = list_files_for_tenant(selected_address, tenant)
-        
-        # Extract metrics from metadata
-        for file in files:
-            metadata = get_metadata_for_file(file['Key'])
-            document_type = metadata.get('document_type', '').lower()
-            
-            if document_type == 'credit score':
-                tenant_data['Credit Score'] = metadata.get('credit score', 'N/A')
-            elif document_type == 'income verification':
-                tenant_data['Monthly Income'] = metadata.get('monthly income', 'N/A')
-            elif document_type == 'references':
-                tenant_data['References'] = metadata.get('references', 'N/A')
-
-        # Calculating custom metrics like rent-to-income ratio
-        rent = 1000  # Replace this with actual rent value if available
-        tenant_data['Rent-to-Income Ratio (%)'] = calculate_rent_to_income(rent, tenant_data.get('Monthly Income', 0))
-        comparison_data.append(tenant_data)
+    # Scoring weights and ranking scope
+    with st.expander("Scoring weights"):
+        weights = {
+            'affordability': st.slider("Affordability (rent-to-income)", 0.0, 1.0, DEFAULT_WEIGHTS['affordability'], 0.05),
+            'credit': st.slider("Credit score", 0.0, 1.0, DEFAULT_WEIGHTS['credit'], 0.05),
+            'references': st.slider("References", 0.0, 1.0, DEFAULT_WEIGHTS['references'], 0.05),
+        }
+    if sum(weights.values()) <= 0:
+        st.warning("Please give at least one scoring component a positive weight.")
+        return
+    all_listings = st.checkbox("Rank applicants across all listings")
+    if all_listings:
+        metrics = metrics_store.listing_metrics()
 
-    # Create DataFrame for visualization
-    df = pd.DataFrame(comparison_data)
+    scored = score_tenants(metrics, weights)
+    top_n = st.number_input("Show top N applicants:", min_value=1, max_value=max(len(scored), 1), value=min(10, len(scored)), step=1)
+    per_listing = all_listings and st.checkbox("Top N per listing")
+    df = top_applicants(scored, int(top_n), per_listing=per_listing)
+    df = df[list(DISPLAY_COLUMNS)].rename(columns=DISPLAY_COLUMNS)
+    df['Tenant Name'] = df['Tenant Name'].str.replace('_', ' ')
+    df['Credit Bucket'] = df['Credit Bucket'].astype(str).replace('nan', '')
+    if not all_listings:
+        df = df.drop(columns='Listing')
 
     # Displaying data in a table
-    st.write("## Comparison Table")
-    st.dataframe(df)
+    st.write("## Ranked Applicants")
+    st.dataframe(df, hide_index=True)
+
+    # Visualizing Fit Score comparison
+    st.write("## Fit Score Comparison")
+    fig = px.bar(df, x='Tenant Name', y='Fit Score', title='Fit Score Comparison', text='Fit Score')
+    st.plotly_chart(fig)
 
     # Visualizing Credit Score comparison
-    if 'Credit Score' in df.columns:
-        st.write("## Credit Score Comparison")
-        fig = px.bar(df, x='Tenant Name', y='Credit Score', title='Credit Score Comparison', text='Credit Score')
-        st.plotly_chart(fig)
+    st.write("## Credit Score Comparison")
+    fig = px.bar(df, x='Tenant Name', y='Credit Score', title='Credit Score Comparison', text='Credit Score')
+    st.plotly_chart(fig)
 
     # Visualizing Rent-to-Income Ratio comparison
-    if 'Rent-to-Income Ratio (%)' in df.columns:
-        st.write("## Rent-to-Income Ratio Comparison")
-        fig = px.bar(df, x='Tenant Name', y='Rent-to-Income Ratio (%)', title='Rent-to-Income Ratio Comparison', text='Rent-to-Income Ratio (%)')
-        st.plotly_chart(fig)
+    st.write("## Rent-to-Income Ratio Comparison")
+    fig = px.bar(df, x='Tenant Name', y='Rent-to-Income Ratio (%)', title='Rent-to-Income Ratio Comparison', text='Rent-to-Income Ratio (%)')
+    st.plotly_chart(fig)
 
 if __name__ == "__main__":
     main()
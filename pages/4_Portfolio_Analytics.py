@@ -0,0 +1,90 @@
+import streamlit as st
+import pandas as pd
+import plotly.express as px
+from utils import metrics_store
+from tenant_metrics import REQUIRED_DOCUMENT_TYPES, refresh_portfolio
+from tenant_scoring import score_tenants
+
+
+def completeness(document_types):
+    """Share of the required document types present in each application"""
+    required = set(REQUIRED_DOCUMENT_TYPES)
+    return document_types.map(lambda types: len(required.intersection(types)) / len(required))
+
+def main():
+    st.title('Portfolio Analytics')
+
+    # Everything below renders from the local aggregates; S3 is only scanned on refresh, or until a scan has
+    # stored document aggregates (listings alone are also recorded by the home and comparison pages)
+    if st.button("Refresh from S3") or not metrics_store.document_fingerprints():
+        with st.spinner("Scanning listings for new and changed applications..."):
+            # LLM extraction is left to the comparison page; this page only aggregates documents and stored metrics
+            updated = refresh_portfolio(extract_metrics=False)
+        st.info(f"{updated} applications updated.")
+
+    listings = metrics_store.listings()
+    portfolio = metrics_store.portfolio()
+    if portfolio.empty:
+        st.warning("No applications available at the moment.")
+        return
+
+    scored = score_tenants(portfolio)
+    scored['completeness'] = completeness(scored['document_types'])
+    scored['complete'] = scored['completeness'] >= 1.0
+    scored['has_metrics'] = scored['credit_score'].notna() & scored['monthly_income'].notna()
+
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Listings", len(listings))
+    col2.metric("Applicants", len(scored))
+    col3.metric("Complete applications", f"{scored['complete'].mean():.0%}")
+    col4.metric("Median fit score", f"{scored['fit_score'].median():.1f}")
+
+    # Applicant funnel
+    st.write("## Applicant Funnel")
+    strong_fit = st.slider("Strong fit from score:", 0, 100, 70, 5)
+    funnel = pd.DataFrame({
+        'Stage': ['Applied', 'Documents complete', 'Metrics extracted', 'Strong fit'],
+        'Applicants': [
+            len(scored),
+            int(scored['complete'].sum()),
+            int((scored['complete'] & scored['has_metrics']).sum()),
+            int((scored['complete'] & scored['has_metrics'] & (scored['fit_score'] >= strong_fit)).sum()),
+        ],
+    })
+    st.plotly_chart(px.funnel(funnel, x='Applicants', y='Stage'))
+
+    # Document completeness
+    st.write("## Document Completeness")
+    required = pd.DataFrame({
+        'Document Type': list(REQUIRED_DOCUMENT_TYPES),
+        'Share of Applicants': [scored['document_types'].map(lambda types, t=t: t in types).mean() for t in REQUIRED_DOCUMENT_TYPES],
+    })
+    fig = px.bar(required, x='Document Type', y='Share of Applicants', title='Applicants Providing Each Required Document')
+    fig.update_yaxes(tickformat='.0%', range=[0, 1])
+    st.plotly_chart(fig)
+    fig = px.histogram(scored, x='documents', title='Documents per Applicant')
+    st.plotly_chart(fig)
+
+    # Score distribution
+    st.write("## Fit Score Distribution")
+    fig = px.histogram(scored, x='fit_score', nbins=20, title='Fit Scores Across All Listings')
+    st.plotly_chart(fig)
+
+    # Per-listing summary
+    st.write("## Listings")
+    summary = scored.groupby('address').agg(
+        Applicants=('tenant', 'size'),
+        Complete=('complete', 'mean'),
+        Documents=('documents', 'sum'),
+        Median_Fit=('fit_score', 'median'),
+        Best_Fit=('fit_score', 'max'),
+        Rent=('rent', 'first'),
+    ).reset_index().rename(columns={'address': 'Listing', 'Median_Fit': 'Median Fit Score', 'Best_Fit': 'Best Fit Score'})
+    summary = pd.DataFrame({'Listing': listings}).merge(summary, on='Listing', how='left')
+    summary['Applicants'] = summary['Applicants'].fillna(0).astype(int)
+    summary['Complete'] = (summary['Complete'] * 100).round(0)
+    summary = summary.rename(columns={'Complete': 'Complete (%)'})
+    st.dataframe(summary.sort_values('Applicants', ascending=False), hide_index=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Precompute tenant reports for every listing.
+
+Walks listings -> tenants -> extracted documents, skips tenants whose documents have not changed since their
+stored report was computed, and builds the rest in a worker pool. Reports are committed one tenant at a time,
+so an interrupted run resumes where it stopped.
+
+Usage: python precompute_reports.py [--workers 4] [--document-workers 4] [--address ADDRESS]
+"""
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from utils import LLM_MAX_CONCURRENCY, llm_usage, iter_created_listings, iter_tenants_for_address, get_files_for_tenant
+from tenant_report import ReportStore, iter_document_analyses, build_report_input, complete_tenant_report, tenant_fingerprint
+
+
+def find_stale_tenants(store, addresses=None):
+    """Yield (address, tenant, files, fingerprint) for every tenant whose stored report is missing or out of date"""
+    for address in addresses or iter_created_listings():
+        for tenant in iter_tenants_for_address(address):
+            files = get_files_for_tenant(address, tenant, only_text=True)
+            if not files:
+                continue
+            fingerprint = tenant_fingerprint(files)
+            if store.fingerprint(address, tenant) != fingerprint:
+                yield address, tenant, files, fingerprint
+
+def precompute_tenant(store, address, tenant, files, fingerprint, document_workers):
+    """Analyze one tenant's documents, build the final report and store both. Returns the number of documents."""
+    name = tenant.replace('_', ' ')
+    analyses = {}
+    for index, document_type, analysis in iter_document_analyses(address, tenant, document_workers, files=files):
+        analyses[index] = (document_type, analysis)
+    ordered_analyses = [analyses[index] for index in sorted(analyses)]
+    report = complete_tenant_report(name, address, build_report_input(name, ordered_analyses))
+    store.put(address, tenant, fingerprint, ordered_analyses, report)
+    return len(files)
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute tenant reports for the AI Analysis page.")
+    parser.add_argument('--workers', type=int, default=4, help="Number of tenants processed at once.")
+    parser.add_argument('--document-workers', type=int, default=LLM_MAX_CONCURRENCY,
+                        help="Number of documents analyzed at once per tenant.")
+    parser.add_argument('--address', action='append', help="Only process this listing (may be repeated).")
+    args = parser.parse_args()
+
+    store = ReportStore()
+    started = time.monotonic()
+    tokens_before = llm_usage['prompt_tokens'] + llm_usage['completion_tokens']
+    totals = {'tenants': 0, 'documents': 0, 'failed': 0}
+
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as executor:
+        futures = {
+            executor.submit(precompute_tenant, store, address, tenant, files, fingerprint, args.document_workers): (address, tenant)
+            for address, tenant, files, fingerprint in find_stale_tenants(store, args.address)
+        }
+        print(f"{len(futures)} tenants need a new report.")
+        for future in as_completed(futures):
+            address, tenant = futures[future]
+            try:
+                documents = future.result()
+            except Exception as e:
+                totals['failed'] += 1
+                print(f"Failed to precompute report for {tenant} at {address}: {e}")
+                continue
+            totals['tenants'] += 1
+            totals['documents'] += documents
+            print(f"Stored report for {tenant} at {address} ({documents} documents).")
+
+    minutes = max(time.monotonic() - started, 1e-6) / 60
+    tokens = llm_usage['prompt_tokens'] + llm_usage['completion_tokens'] - tokens_before
+    print(
+        f"Precomputed {totals['tenants']} tenants ({totals['failed']} failed), {totals['documents']} documents "
+        f"in {minutes * 60:.1f} seconds: {totals['documents'] / minutes:.1f} documents/min, {tokens / minutes:.0f} tokens/min."
+    )
+
+if __name__ == "__main__":
+    main()
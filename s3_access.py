@@ -0,0 +1,182 @@
+import os
+import asyncio
+import weakref
+import threading
+from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
+import boto3
+from botocore.client import Config
+
+# Connection pool and retry settings of the shared S3 client
+S3_MAX_POOL_CONNECTIONS = int(os.environ.get('S3_MAX_POOL_CONNECTIONS', 64))
+S3_MAX_ATTEMPTS = int(os.environ.get('S3_MAX_ATTEMPTS', 8))
+S3_RETRY_MODE = os.environ.get('S3_RETRY_MODE', 'adaptive')
+S3_CONNECT_TIMEOUT = float(os.environ.get('S3_CONNECT_TIMEOUT', 5))
+S3_READ_TIMEOUT = float(os.environ.get('S3_READ_TIMEOUT', 60))
+# Requests in flight per fan-out call; more than the pool size would only queue on connections
+S3_MAX_WORKERS = int(os.environ.get('S3_MAX_WORKERS', S3_MAX_POOL_CONNECTIONS))
+
+
+def make_s3_client(aws_access_key_id=None, aws_secret_access_key=None, region_name='eu-north-1',
+                   max_pool_connections=S3_MAX_POOL_CONNECTIONS, max_attempts=S3_MAX_ATTEMPTS, retry_mode=S3_RETRY_MODE):
+    """Create an S3 client with a connection pool sized for fan-out and client-side adaptive retries"""
+    return boto3.client(
+        's3',
+        aws_access_key_id=aws_access_key_id,
+        aws_secret_access_key=aws_secret_access_key,
+        config=Config(
+            region_name=region_name,
+            signature_version='s3v4',
+            max_pool_connections=max_pool_connections,
+            connect_timeout=S3_CONNECT_TIMEOUT,
+            read_timeout=S3_READ_TIMEOUT,
+            retries={'total_max_attempts': max_attempts, 'mode': retry_mode},
+        ))
+
+
+def read_body(response, chunk_size=1024 * 1024) -> bytes:
+    """Stream a get_object response body into memory and return it as bytes"""
+    buffer = BytesIO()
+    for chunk in response['Body'].iter_chunks(chunk_size):
+        buffer.write(chunk)
+    return buffer.getvalue()
+
+
+class S3Access:
+    """
+    Concurrent access to one bucket through a shared, pooled client.
+    The *_many methods fan a batch of requests out over a thread pool sized to the connection pool and
+    return the results in input order.
+    """
+    def __init__(self, client, bucket: str, max_workers: int=S3_MAX_WORKERS):
+        """
+        Create a new instance of "S3Access".
+
+        Parameters
+        ----------
+        client: botocore.client.S3
+            Client to issue the requests with; boto3 clients are safe to share between threads.
+        bucket: str
+            Name of the bucket.
+        max_workers: int
+            Maximum number of requests in flight at once.
+        """
+        self.client = client
+        self.bucket = bucket
+        self.max_workers = max(1, max_workers)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        """Thread pool shared by every fan-out call, created on first use"""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='s3')
+            return self._executor
+
+    def get(self, key: str, chunk_size: int=1024 * 1024) -> bytes:
+        """Download an object's body"""
+        return read_body(self.client.get_object(Bucket=self.bucket, Key=key), chunk_size)
+
+    def head(self, key: str) -> dict:
+        """Return an object's HEAD response"""
+        return self.client.head_object(Bucket=self.bucket, Key=key)
+
+    def list(self, prefix: str, delimiter: str=None) -> dict:
+        """
+        List everything under prefix, following continuation tokens.
+
+        Returns
+        -------
+        dict
+            'objects': the listed objects, and 'prefixes': the common prefixes when a delimiter is given.
+        """
+        params = {'Bucket': self.bucket, 'Prefix': prefix}
+        if delimiter:
+            params['Delimiter'] = delimiter
+        objects, prefixes = [], []
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(**params):
+            objects.extend(page.get('Contents', []))
+            prefixes.extend(common['Prefix'] for common in page.get('CommonPrefixes', []))
+        return {'objects': objects, 'prefixes': prefixes}
+
+    def _many(self, function, items, return_exceptions=False):
+        """Apply function to every item concurrently; errors are raised, or returned in place with return_exceptions"""
+        futures = [self.executor.submit(function, item) for item in items]
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                if not return_exceptions:
+                    for pending in futures:
+                        pending.cancel()
+                    raise
+                results.append(e)
+        return results
+
+    def get_many(self, keys, return_exceptions=False) -> list:
+        """Download many objects concurrently, returning their bodies in the order of keys"""
+        return self._many(self.get, keys, return_exceptions)
+
+    def head_many(self, keys, return_exceptions=False) -> list:
+        """HEAD many objects concurrently, returning the responses in the order of keys"""
+        return self._many(self.head, keys, return_exceptions)
+
+    def list_many(self, prefixes, delimiter: str=None, return_exceptions=False) -> list:
+        """List many prefixes concurrently, returning one result of list() per prefix in order"""
+        return self._many(lambda prefix: self.list(prefix, delimiter), prefixes, return_exceptions)
+
+
+class AsyncS3Access:
+    """
+    asyncio front end of S3Access for callers that already run an event loop.
+    Requests run on the S3Access thread pool, so the pooled client and its retry policy are shared,
+    and a semaphore bounds how many are in flight.
+    """
+    def __init__(self, access: S3Access, max_concurrency: int=None):
+        """
+        Create a new instance of "AsyncS3Access".
+
+        Parameters
+        ----------
+        access: S3Access
+            Synchronous access layer whose client and thread pool are used.
+        max_concurrency: int
+            Maximum number of requests in flight; defaults to the thread pool size.
+        """
+        self.access = access
+        self.max_concurrency = max_concurrency or access.max_workers
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        """One semaphore per event loop, as asyncio primitives cannot be shared between loops"""
+        loop = asyncio.get_running_loop()
+        if loop not in self._semaphores:
+            self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphores[loop]
+
+    async def _run(self, function, *args):
+        async with self._semaphore():
+            return await asyncio.get_running_loop().run_in_executor(self.access.executor, function, *args)
+
+    async def get(self, key: str) -> bytes:
+        return await self._run(self.access.get, key)
+
+    async def head(self, key: str) -> dict:
+        return await self._run(self.access.head, key)
+
+    async def list(self, prefix: str, delimiter: str=None) -> dict:
+        return await self._run(self.access.list, prefix, delimiter)
+
+    async def get_many(self, keys, return_exceptions=False) -> list:
+        return await asyncio.gather(*(self.get(key) for key in keys), return_exceptions=return_exceptions)
+
+    async def head_many(self, keys, return_exceptions=False) -> list:
+        return await asyncio.gather(*(self.head(key) for key in keys), return_exceptions=return_exceptions)
+
+    async def list_many(self, prefixes, delimiter: str=None, return_exceptions=False) -> list:
+        return await asyncio.gather(*(self.list(prefix, delimiter) for prefix in prefixes),
+                                    return_exceptions=return_exceptions)
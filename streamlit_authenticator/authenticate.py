@@ -5,6 +5,8 @@ from datetime import datetime, timedelta
 import extra_streamlit_components as stx
 from pymongo import MongoClient
 import os
+import time
+import threading
 from .hasher import Hasher
 from .utils import generate_random_pw
 from .exceptions import CredentialsError, ForgotError, RegisterError, ResetError, UpdateError
@@ -12,6 +14,58 @@ from mailchimp3 import MailChimp
 import re
 import requests
 
+# Seconds a user record read from MongoDB is reused before it is read again
+USER_CACHE_TTL_SECONDS = int(os.environ.get('USER_CACHE_TTL_SECONDS', 60))
+
+# User records keyed by email -> (fetched_at, record), shared by every session of this process
+_user_cache = {}
+_user_cache_lock = threading.Lock()
+
+# The only user fields the authenticator reads, so the login lookup fetches them in a single query
+_USER_FIELDS = {'_id': 0, 'email': 1, 'name': 1, 'password': 1, 'verified': 1}
+
+# Hash that unknown emails are checked against, so they take as long as known ones; built at import so
+# the first unknown email does not pay for an extra hashpw
+_dummy_hash = bcrypt.hashpw(os.urandom(16).hex().encode(), bcrypt.gensalt())
+
+def _verify_password(password: str, hashed_password: str) -> bool:
+    """
+    Checks a password against a bcrypt hash.
+
+    Parameters
+    ----------
+    password: str
+        The plain text password.
+    hashed_password: str
+        The stored hash, or None for an unknown user; a dummy hash is checked instead so timing does not leak.
+    Returns
+    -------
+    bool
+        Whether the password matches.
+    """
+    if hashed_password is None:
+        bcrypt.checkpw(password.encode(), _dummy_hash)
+        return False
+    return bcrypt.checkpw(password.encode(), hashed_password.encode())
+
+@st.cache_resource
+def _get_mongo_client(mongo_uri: str) -> MongoClient:
+    """
+    Creates the process-wide pooled MongoDB client, shared across Streamlit sessions.
+
+    Parameters
+    ----------
+    mongo_uri: str
+        The MongoDB connection string.
+    Returns
+    -------
+    MongoClient
+        The pooled client.
+    """
+    client = MongoClient(mongo_uri, maxPoolSize=int(os.environ.get('MONGO_MAX_POOL_SIZE', 50)))
+    client['vivicheck']['users'].create_index('email')
+    return client
+
 class Authenticate:
     """
     This class will create login, logout, register user, reset password, forgot password, 
@@ -46,6 +100,52 @@ class Authenticate:
         #self.mailchimp_client = MailChimp(mc_api=os.environ['MAILCHIMP_API_KEY'])
         self.preauthorized = {'emails': ['']}
 
+    def _users(self):
+        """
+        Returns the users collection through the pooled client.
+        Returns
+        -------
+        Collection
+            The "users" collection of the "vivicheck" database.
+        """
+        return _get_mongo_client(self.mongo_uri)['vivicheck']['users']
+
+    def _find_user(self, email: str) -> dict:
+        """
+        Retrieves a user record, reusing a recently read copy when there is one.
+
+        Parameters
+        ----------
+        email: str
+            The email of the user.
+        Returns
+        -------
+        dict
+            The user record, or None if there is no user with that email.
+        """
+        now = time.time()
+        with _user_cache_lock:
+            cached = _user_cache.get(email)
+        if cached is not None and now - cached[0] < USER_CACHE_TTL_SECONDS:
+            return cached[1]
+        user = self._users().find_one({'email': email}, _USER_FIELDS)
+        if user is not None:
+            with _user_cache_lock:
+                _user_cache[email] = (now, user)
+        return user
+
+    def _invalidate_user(self, email: str):
+        """
+        Drops a user record from the cache after it has been modified.
+
+        Parameters
+        ----------
+        email: str
+            The email of the modified user.
+        """
+        with _user_cache_lock:
+            _user_cache.pop(email, None)
+
     def _token_encode(self) -> str:
         """
         Encodes the contents of the reauthentication cookie.
@@ -90,15 +190,8 @@ class Authenticate:
         bool
             The validity of the entered password by comparing it to the hashed password in the Airtable.
         """
-        client = MongoClient(self.mongo_uri)
-        db = client['vivicheck']
-        users = db['users'] 
-        user = users.find_one({'email': self.email})
-        client.close()
-        if user is not None:
-            hashed_pw = user['password']
-            return bcrypt.checkpw(self.password.encode(), hashed_pw.encode())
-        return False
+        user = self._find_user(self.email)
+        return _verify_password(self.password, user['password'] if user is not None else None)
 
     def _check_cookie(self):
         """
@@ -130,11 +223,7 @@ class Authenticate:
         """
         print('checking email verified')
         print(self.email)
-        client = MongoClient(self.mongo_uri)
-        db = client['vivicheck']
-        users = db['users'] 
-        user = users.find_one({'email': str(self.email)})
-        client.close()
+        user = self._find_user(str(self.email))
         print(user)
         if user is not None:
             if 'verified' in user and user['verified']:
@@ -164,39 +253,21 @@ class Authenticate:
             Validity of entered credentials.
         """
         print('checking credentials....')
-        st.session_state['verified'] = False
-        client = MongoClient(self.mongo_uri)
-        db = client['vivicheck']
-        users = db['users'] 
-        user = users.find_one({'email':self.email})
-        client.close()
-        if user is not None:
-            try:
-                if 'verified' in user and user['verified']:
-                    print("VERIFIED")
-                    st.session_state['verified'] = True                    
-                if self._check_pw():
-                    if inplace:
-                        st.session_state['name'] = user['name']
-                        self.exp_date = self._set_exp_date()
-                        self.token = self._token_encode()
-                        self.cookie_manager.set(self.cookie_name, self.token,
-                                                expires_at=datetime.now() + timedelta(days=self.cookie_expiry_days))
-                        st.session_state['authentication_status'] = True
-                    else:
-                        return True
-                else:
-                    if inplace:
-                        st.session_state['authentication_status'] = False
-                    else:
-                        return False
-            except Exception as e:
-                print(e)
+        # One lookup provides the name, hash and verified flag
+        user = self._find_user(self.email)
+        st.session_state['verified'] = bool(user is not None and user.get('verified'))
+        valid = _verify_password(self.password, user['password'] if user is not None else None)
+        if not inplace:
+            return valid
+        if valid:
+            st.session_state['name'] = user['name']
+            self.exp_date = self._set_exp_date()
+            self.token = self._token_encode()
+            self.cookie_manager.set(self.cookie_name, self.token,
+                                    expires_at=datetime.now() + timedelta(days=self.cookie_expiry_days))
+            st.session_state['authentication_status'] = True
         else:
-            if inplace:
-                st.session_state['authentication_status'] = False
-            else:
-                return False
+            st.session_state['authentication_status'] = False
 
 
     def login(self, form_name: str, location: str='main') -> tuple:
@@ -284,13 +355,11 @@ class Authenticate:
             The updated plain text password.
         """
         hashed_password = Hasher([password]).generate()[0]
-        client = MongoClient(self.mongo_uri)
-        db = client['vivicheck']
-        users = db['users'] 
+        users = self._users()
         user_records = users.find_one({'email': self.email})
         if user_records:
-            users.update_one({"email": self.email}, {"$set": {"password": hashed_password}})        
-        client.close()
+            users.update_one({"email": self.email}, {"$set": {"password": hashed_password}})
+        self._invalidate_user(self.email)
 
     def reset_password(self, email: str, form_name: str, location: str='main') -> bool:
         """
@@ -324,11 +393,7 @@ class Authenticate:
         new_password = reset_password_form.text_input('New password', type='password')
         new_password_repeat = reset_password_form.text_input('Repeat password', type='password')
         if reset_password_form.form_submit_button('Reset'):
-            client = MongoClient(self.mongo_uri)
-            db = client['vivicheck']
-            users = db['users']
-            user_info = users.find_one({'email': self.email})
-            client.close()
+            user_info = self._find_user(self.email)
             if user_info is not None:
                 if self._check_credentials(inplace=False):
                     if len(new_password) > 0:
@@ -375,11 +440,8 @@ class Authenticate:
             'postal_code': postal_code,
             'created': datetime.now()
         }
-        client = MongoClient(self.mongo_uri)
-        db = client['vivicheck']
-        users = db['users']
-        users.insert_one(user_credentials)
-        client.close()
+        self._users().insert_one(user_credentials)
+        self._invalidate_user(email)
         try:
             self.mailchimp_client.lists.members.create(os.environ['MAILCHIMP_LIST_ID'], {
                     'email_address': email,
@@ -445,37 +507,27 @@ class Authenticate:
         new_password_repeat = register_user_form.text_input('Repeat password', type='password')
         postal_code = register_user_form.text_input('Your postal code')
         needs = register_user_form.radio('I want to', ["Buy", "Sell", "Both", "I am a realtor"])
-        client = MongoClient(self.mongo_uri)
-        db = client['vivicheck']
-        users = db['users']
         if register_user_form.form_submit_button('Register'):
             if validate_email(new_email):
                 if len(new_email) and len(new_email) and len(new_name) and len(new_password) > 0:
-                    if users.find_one({'email': new_email}) is None:
+                    if self._find_user(new_email) is None:
                         if new_password == new_password_repeat:
                             if preauthorization:
                                 if self.preauthorized.find_one({'email': new_email}) is not None:
                                     self._register_credentials(new_email, new_name, new_password, preauthorization, needs, postal_code)
-                                    client.close()
                                     return True
                                 else:
-                                    client.close()
                                     raise RegisterError('User not preauthorized to register')
                             else:
                                 self._register_credentials(new_email, new_name, new_password, preauthorization, needs, postal_code)
-                                client.close()
                                 return True
                         else:
-                            client.close()
                             raise RegisterError('Passwords do not match')
                     else:
-                        client.close()
                         raise RegisterError('email already taken')
                 else:
-                    client.close()
                     raise RegisterError('Please enter an email, name, and password')
             else:
-                client.close()
                 raise RegisterError('Please enter a valid email address')
 
     def _set_random_password(self, email: str) -> str:
@@ -493,11 +545,8 @@ class Authenticate:
         """
         self.random_password = generate_random_pw()
         hashed_password = Hasher([self.random_password]).generate()[0]
-        client = MongoClient(self.mongo_uri)
-        db = client['vivicheck']
-        users = db['users']
-        users.update_one({'email': email},  {'$set': {'password': hashed_password}})
-        client.close()
+        self._users().update_one({'email': email},  {'$set': {'password': hashed_password}})
+        self._invalidate_user(email)
         return self.random_password
 
     def forgot_password(self, form_name: str, location: str='main') -> tuple:
@@ -531,11 +580,7 @@ class Authenticate:
 
         if forgot_password_form.form_submit_button('Submit'):
             if len(email) > 0:
-                client = MongoClient(self.mongo_uri)
-                db = client['vivicheck']
-                users = db['users']
-                user = users.find_one({'email': email})
-                client.close()
+                user = self._find_user(email)
                 if user:
                     return email, user['email'], self._set_random_password(email)
                 else:
@@ -559,11 +604,10 @@ class Authenticate:
         str
             email associated with given key, value pair i.e. "jsmith".
         """
-        client = MongoClient(self.mongo_uri)
-        db = client['vivicheck']
-        users = db['users']
-        user = users.find_one({key: value})
-        client.close()
+        if key == 'email':
+            user = self._find_user(value)
+        else:
+            user = self._users().find_one({key: value})
         if user:
             return user['email']
         return False
@@ -615,11 +659,8 @@ class Authenticate:
         value: str
             The updated entry value i.e. "jsmith@gmail.com".
         """
-        client = MongoClient(self.mongo_uri)
-        db = client['vivicheck']
-        users = db['users']
-        users.update_one({'email': email},  {'$set': {key: value}})
-        client.close()
+        self._users().update_one({'email': email},  {'$set': {key: value}})
+        self._invalidate_user(email)
 
     def update_user_details(self, email: str, form_name: str, location: str='main') -> bool:
         """
@@ -649,27 +690,20 @@ class Authenticate:
         self.email = email.lower()
         field = update_user_details_form.selectbox('Field', ['name', 'email']).lower()
         new_value = update_user_details_form.text_input('New value')
-        client = MongoClient(self.mongo_uri)
-        db = client['vivicheck']
-        users = db['users']
         if update_user_details_form.form_submit_button('Update'):
             if len(new_value) > 0:
-                user_record = users.find_one({'email': self.email})
+                user_record = self._find_user(self.email)
                 print(user_record)
                 if new_value != user_record[field]:
-                    users.update_one({'email': self.email},  {'$set': {field: new_value}})
-                    client.close()
+                    self._update_entry(self.email, field, new_value)
                     if field == 'name':
                             st.session_state['name'] = new_value
                             self.exp_date = self._set_exp_date()
                             self.token = self._token_encode()
                             self.cookie_manager.set(self.cookie_name, self.token,
                             expires_at=datetime.now() + timedelta(days=self.cookie_expiry_days))
-                    client.close()
                     return True
                 else:
-                    client.close()
                     raise UpdateError('New and current values are the same')
             if len(new_value) == 0:
-                client.close()
                 raise UpdateError('New value not provided')
@@ -0,0 +1,62 @@
+import os
+import json
+import time
+from local_store import LOCAL_STORE_PATH, LocalStore
+
+SUBSCRIPTION_CACHE_PATH = os.environ.get('SUBSCRIPTION_CACHE_PATH', LOCAL_STORE_PATH)
+# Active subscriptions are trusted for longer than missing ones, so a new subscriber is picked up quickly
+SUBSCRIBED_TTL_SECONDS = int(os.environ.get('SUBSCRIBED_TTL_SECONDS', 6 * 3600))
+NOT_SUBSCRIBED_TTL_SECONDS = int(os.environ.get('NOT_SUBSCRIBED_TTL_SECONDS', 300))
+
+
+class SubscriptionCache(LocalStore):
+    """
+    Persistent cache of Stripe subscription status keyed by email.
+    Each entry also records the Stripe customer ids behind the email so webhook events can invalidate it.
+    """
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS subscriptions ("
+        "email TEXT PRIMARY KEY, subscribed INTEGER NOT NULL, customer_ids TEXT NOT NULL, checked REAL NOT NULL)",
+    )
+
+    def __init__(self, path: str=SUBSCRIPTION_CACHE_PATH):
+        """
+        Create a new instance of "SubscriptionCache".
+
+        Parameters
+        ----------
+        path: str
+            Location of the SQLite file holding the cache.
+        """
+        super().__init__(path)
+
+    def get(self, email: str):
+        """Return the cached subscription status of email, or None if it is unknown or expired"""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT subscribed, checked FROM subscriptions WHERE email = ?", (email,)).fetchone()
+        if row is None:
+            return None
+        subscribed, checked = bool(row[0]), row[1]
+        ttl = SUBSCRIBED_TTL_SECONDS if subscribed else NOT_SUBSCRIBED_TTL_SECONDS
+        if time.time() - checked > ttl:
+            return None
+        return subscribed
+
+    def put(self, email: str, subscribed: bool, customer_ids: list):
+        """Store the subscription status of email"""
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO subscriptions (email, subscribed, customer_ids, checked) VALUES (?, ?, ?, ?)",
+                (email, int(subscribed), json.dumps(customer_ids), time.time()))
+
+    def emails_for_customer(self, customer_id: str) -> list:
+        """Return the cached emails backed by a Stripe customer"""
+        with self._lock:
+            rows = self._connection.execute("SELECT email, customer_ids FROM subscriptions").fetchall()
+        return [email for email, customer_ids in rows if customer_id in json.loads(customer_ids)]
+
+    def invalidate(self, email: str):
+        """Forget the cached status of email"""
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM subscriptions WHERE email = ?", (email,))
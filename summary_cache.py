@@ -0,0 +1,99 @@
+import os
+import time
+import hashlib
+from local_store import LOCAL_STORE_PATH, LocalStore
+
+# The summary cache lives next to the Chroma store so every page and job shares it
+SUMMARY_CACHE_PATH = os.environ.get('SUMMARY_CACHE_PATH', LOCAL_STORE_PATH)
+SUMMARY_CACHE_MAX_BYTES = int(os.environ.get('SUMMARY_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+
+
+class SummaryCache(LocalStore):
+    """
+    Persistent, content-addressed cache of LLM responses.
+    Entries are keyed by a hash of the document bytes, the prompt template, the model and the temperature,
+    and the least recently used entries are evicted once the stored text exceeds max_bytes.
+    """
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS summaries ("
+        "key TEXT PRIMARY KEY, summary TEXT NOT NULL, size INTEGER NOT NULL, "
+        "created REAL NOT NULL, last_used REAL NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS summaries_last_used ON summaries (last_used)",
+    )
+
+    def __init__(self, path: str=SUMMARY_CACHE_PATH, max_bytes: int=SUMMARY_CACHE_MAX_BYTES):
+        """
+        Create a new instance of "SummaryCache".
+
+        Parameters
+        ----------
+        path: str
+            Location of the SQLite file holding the cache.
+        max_bytes: int
+            Upper bound on the total size of the cached responses.
+        """
+        super().__init__(path)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(document, prompt: str, model: str, temperature: float) -> str:
+        """Hash the inputs that fully determine an LLM response into a cache key"""
+        if isinstance(document, str):
+            document = document.encode('utf-8')
+        digest = hashlib.sha256()
+        for part in (document, prompt.encode('utf-8'), model.encode('utf-8'), repr(float(temperature)).encode('utf-8')):
+            digest.update(hashlib.sha256(part).digest())
+        return digest.hexdigest()
+
+    def get(self, key: str):
+        """Return the cached response for key, or None, and count the hit or miss"""
+        with self._lock:
+            row = self._connection.execute("SELECT summary FROM summaries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            with self._connection:
+                self._connection.execute("UPDATE summaries SET last_used = ? WHERE key = ?", (time.time(), key))
+            return row[0]
+
+    def put(self, key: str, summary: str):
+        """Store a response and evict least recently used entries beyond max_bytes"""
+        now = time.time()
+        size = len(summary.encode('utf-8'))
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO summaries (key, summary, size, created, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, summary, size, now, now)
+            )
+            total = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM summaries").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            for old_key, old_size in self._connection.execute(
+                    "SELECT key, size FROM summaries WHERE key != ? ORDER BY last_used ASC", (key,)).fetchall():
+                self._connection.execute("DELETE FROM summaries WHERE key = ?", (old_key,))
+                total -= old_size
+                if total <= self.max_bytes:
+                    break
+
+    def get_or_create(self, document, prompt: str, model: str, temperature: float, create):
+        """Return the cached response for these inputs, calling create() and caching its result on a miss"""
+        key = self.make_key(document, prompt, model, temperature)
+        summary = self.get(key)
+        if summary is None:
+            summary = create()
+            self.put(key, summary)
+        return summary
+
+    def stats(self) -> dict:
+        """Hit/miss counters for this process plus the current size of the cache"""
+        with self._lock:
+            entries, size = self._connection.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM summaries").fetchone()
+        return {'hits': self.hits, 'misses': self.misses, 'entries': entries, 'bytes': size}
+
+    def clear(self):
+        """Delete every cached response"""
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM summaries")
@@ -0,0 +1,139 @@
+import os
+import re
+import hashlib
+import threading
+from collections import OrderedDict
+from utils import chat_completion_with_retry, bot_manifest
+
+CHAT_MODEL = os.environ.get('CHAT_MODEL', 'gpt-3.5-turbo-0125')
+# Number of previous question/answer pairs sent along with each question
+CHAT_HISTORY_TURNS = int(os.environ.get('CHAT_HISTORY_TURNS', 4))
+RETRIEVAL_CACHE_SIZE = int(os.environ.get('RETRIEVAL_CACHE_SIZE', 256))
+# Elliptical questions this short that refer back to the conversation also get the previous turn's context
+FOLLOW_UP_MAX_WORDS = int(os.environ.get('FOLLOW_UP_MAX_WORDS', 4))
+
+STOP_WORDS = {
+    'a', 'an', 'the', 'is', 'are', 'was', 'were', 'be', 'do', 'does', 'did', 'of', 'to', 'in', 'on', 'for',
+    'and', 'or', 'me', 'you', 'your', 'please', 'can', 'could', 'would', 'tell', 'about', 'what', 'whats',
+}
+FOLLOW_UP_WORDS = {'it', 'its', 'that', 'this', 'those', 'these', 'they', 'them', 'their', 'he', 'she', 'him', 'her', 'his', 'more', 'else'}
+FOLLOW_UP_PREFIXES = ('and ', 'also ', 'what about ', 'how about ', 'so ')
+
+PROMPT_TEMPLATE = (
+    "Use the following pieces of context to answer the query at the end. If you don't know the answer, "
+    "just say that you don't know, don't try to make up an answer.\n\n{context}\n\nQuery: {query}\n\nHelpful Answer:"
+)
+
+
+def normalize_question(question):
+    """Reduce a question to its distinct content words so rephrasings of it share a retrieval cache entry"""
+    words = re.sub(r"[^a-z0-9\s]", ' ', question.lower()).split()
+    content_words = sorted(set(words) - STOP_WORDS)
+    return ' '.join(content_words or words)
+
+
+class TenantChatEngine:
+    """
+    Streaming chat over a tenant bot's collection.
+    Retrieval results are cached per normalized question and collection version, so repeated or reworded
+    questions skip the vector query, and elliptical follow-ups also get the context retrieved for the previous turn.
+    """
+    def __init__(self, bot, collection: str, model: str=CHAT_MODEL, history_turns: int=CHAT_HISTORY_TURNS,
+                 cache_size: int=RETRIEVAL_CACHE_SIZE):
+        """
+        Create a new instance of "TenantChatEngine".
+
+        Parameters
+        ----------
+        bot: embedchain.App
+            Bot attached to the tenant's collection.
+        collection: str
+            Name of the tenant's collection, used to find its version in the bot manifest.
+        model: str
+            Chat model answering the questions.
+        history_turns: int
+            Number of previous question/answer pairs sent with each question.
+        cache_size: int
+            Maximum number of cached retrieval results.
+        """
+        self.bot = bot
+        self.collection = collection
+        self.model = model
+        self.history_turns = history_turns
+        self.cache_size = cache_size
+        self._retrievals = OrderedDict()
+        self._lock = threading.Lock()
+        self.history = []
+        self.last_contexts = []
+
+    def collection_version(self) -> str:
+        """Fingerprint of the documents currently embedded in the collection; it changes on every refresh that changes them"""
+        digest = hashlib.sha1()
+        for key, (etag, _) in sorted(bot_manifest.entries(self.collection).items()):
+            digest.update(f"{key}\0{etag}\n".encode('utf-8'))
+        return digest.hexdigest()
+
+    def retrieve(self, question: str) -> list:
+        """Return the contexts retrieved for question, querying the vector store only on a cache miss"""
+        key = (self.collection_version(), normalize_question(question))
+        with self._lock:
+            if key in self._retrievals:
+                self._retrievals.move_to_end(key)
+                return self._retrievals[key]
+        contexts = self.bot._retrieve_from_database(question)
+        with self._lock:
+            self._retrievals[key] = contexts
+            while len(self._retrievals) > self.cache_size:
+                self._retrievals.popitem(last=False)
+        return contexts
+
+    def is_follow_up(self, question: str) -> bool:
+        """Guess whether question is an elliptical follow-up that only makes sense with the previous turn"""
+        if not self.last_contexts:
+            return False
+        text = question.lower().strip()
+        if text.startswith(FOLLOW_UP_PREFIXES):
+            return True
+        words = re.sub(r"[^a-z0-9\s]", ' ', text).split()
+        return len(words) <= FOLLOW_UP_MAX_WORDS and any(word in FOLLOW_UP_WORDS for word in words)
+
+    def _messages(self, question: str, contexts: list) -> list:
+        """Build the chat messages: bot system prompt, recent turns, then the question with its context"""
+        messages = []
+        system_prompt = getattr(self.bot.llm.config, 'system_prompt', None)
+        if system_prompt:
+            messages.append({'role': 'system', 'content': system_prompt})
+        for user_message, assistant_message in self.history[-self.history_turns:] if self.history_turns else []:
+            messages.append({'role': 'user', 'content': user_message})
+            messages.append({'role': 'assistant', 'content': assistant_message})
+        context = ' | '.join(contexts)
+        messages.append({'role': 'user', 'content': PROMPT_TEMPLATE.format(context=context, query=question)})
+        return messages
+
+    def stream(self, question: str):
+        """Answer question, yielding the response as it is generated; the turn is recorded once the stream completes"""
+        retrieved = self.retrieve(question)
+        contexts = retrieved
+        if self.is_follow_up(question):
+            # Keep what the previous turn was about alongside what the question itself retrieves
+            contexts = retrieved + [context for context in self.last_contexts if context not in retrieved]
+        stream = chat_completion_with_retry(
+            model=self.model,
+            messages=self._messages(question, contexts),
+            temperature=0.0,
+            stream=True)
+        parts = []
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            text = chunk.choices[0].delta.content
+            if text:
+                parts.append(text)
+                yield text
+        self.history.append((question, ''.join(parts)))
+        self.last_contexts = retrieved
+
+    def reset(self):
+        """Forget the conversation; cached retrievals are kept"""
+        self.history = []
+        self.last_contexts = []
@@ -0,0 +1,95 @@
+import os
+from collections import OrderedDict
+import streamlit as st
+from utils import get_files_for_tenant, get_metadata_for_files, read_document_bytes, decode_document
+
+# Fetched document bodies kept per session, least recently used first out
+SESSION_BODY_CACHE_BYTES = int(os.environ.get('SESSION_BODY_CACHE_BYTES', 32 * 1024 * 1024))
+
+
+def _session_bodies():
+    """Per-session LRU of fetched bodies keyed by (S3 key, ETag)"""
+    if 'document_bodies' not in st.session_state:
+        st.session_state['document_bodies'] = OrderedDict()
+    return st.session_state['document_bodies']
+
+def fetch_body(key, etag):
+    """Return the body of one version of an S3 object, downloading it at most once per session"""
+    bodies = _session_bodies()
+    if (key, etag) in bodies:
+        bodies.move_to_end((key, etag))
+        return bodies[(key, etag)]
+    data = read_document_bytes(key)
+    bodies[(key, etag)] = data
+    total = sum(len(body) for body in bodies.values())
+    while total > SESSION_BODY_CACHE_BYTES and len(bodies) > 1:
+        _, evicted = bodies.popitem(last=False)
+        total -= len(evicted)
+    return data
+
+
+class TenantDocumentContext:
+    """
+    A tenant's documents as seen by one rerun of a page: every uploaded original paired with its extracted
+    .txt sibling and their metadata, built from a single listing pass and one batch of metadata lookups.
+    Bodies are fetched lazily and memoized for the session, so each document costs at most one download.
+    """
+    def __init__(self, address: str, tenant_name: str):
+        """
+        Create a new instance of "TenantDocumentContext".
+
+        Parameters
+        ----------
+        address: str
+            Listing the tenant applied for.
+        tenant_name: str
+            Tenant folder name (with underscores).
+        """
+        self.address = address
+        self.tenant_name = tenant_name
+        self.files = get_files_for_tenant(address, tenant_name) if tenant_name else []
+        self.metadata = dict(zip([file['Key'] for file in self.files], get_metadata_for_files(self.files)))
+        self.documents = self._pair_documents()
+
+    def _document_type(self, file) -> str:
+        return self.metadata[file['Key']].get('document_type', '').lower()
+
+    def _pair_documents(self) -> list:
+        """
+        Pair each original with the .txt file extracted from it: the .txt with the same name if there is one,
+        otherwise an unpaired .txt of the same document type. A .txt without an original (e.g. a YouTube URL)
+        is a document of its own.
+        """
+        originals = [file for file in self.files if not file['Key'].endswith('.txt')]
+        texts = {file['Key']: file for file in self.files if file['Key'].endswith('.txt')}
+        documents = []
+        for original in originals:
+            text = texts.pop(f"{os.path.splitext(original['Key'])[0]}.txt", None)
+            if text is None:
+                text = next((file for file in texts.values()
+                             if self._document_type(file) == self._document_type(original)), None)
+                if text is not None:
+                    del texts[text['Key']]
+            documents.append({'original': original, 'text': text, 'document_type': self._document_type(original)})
+        for text in texts.values():
+            documents.append({'original': text, 'text': text, 'document_type': self._document_type(text)})
+        return documents
+
+    def categories(self) -> list:
+        """Return the distinct document types of the tenant's documents, in listing order"""
+        return list(dict.fromkeys(document['document_type'] for document in self.documents))
+
+    def document_for_category(self, category: str):
+        """Return the first document of a document type, or None"""
+        return next((document for document in self.documents if document['document_type'] == category), None)
+
+    def body(self, file) -> bytes:
+        """Return the raw body of a listed file"""
+        return fetch_body(file['Key'], file.get('ETag', ''))
+
+    def text(self, document):
+        """Return the decoded extracted text of a document, or None if it has no .txt sibling"""
+        if document['text'] is None:
+            return None
+        etag = document['text'].get('ETag')
+        return decode_document(self.body(document['text']), etag)
@@ -0,0 +1,198 @@
+import re
+import json
+from concurrent.futures import ThreadPoolExecutor
+from botocore.exceptions import ClientError
+from utils import (LLM_MAX_CONCURRENCY, LISTINGS_FOLDER, metrics_store, complete_document_prompt, summarize_tenant_document,
+                   read_text_document, get_tenants_for_address, get_files_for_tenant, get_files_for_tenants, get_metadata_for_file,
+                   get_metadata_for_files, iter_listing_objects, invalidate_listing_cache)
+from tenant_report import tenant_fingerprint
+
+# document_type -> (metrics column, S3 user metadata key set at upload)
+METRIC_SOURCES = {
+    'credit score': ('credit_score', 'credit score'),
+    'income verification': ('monthly_income', 'monthly income'),
+    'references': ('references_note', 'references'),
+}
+NUMERIC_METRICS = {'credit_score', 'monthly_income'}
+# Document types an application needs to count as complete
+REQUIRED_DOCUMENT_TYPES = tuple(METRIC_SOURCES)
+
+METRIC_EXTRACTION_SYSTEM_PROMPT = (
+    'You extract structured data from summaries of documents provided by prospective tenants. '
+    'Only report values that are stated in the summary; never estimate.'
+)
+
+
+def parse_number(value):
+    """Parse the first number in a value such as '$4,500 / month' or '720', or return None"""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = re.search(r"-?\d[\d,]*(?:\.\d+)?", str(value))
+    if match is None:
+        return None
+    try:
+        return float(match.group(0).replace(',', ''))
+    except ValueError:
+        return None
+
+def _clean_metric(column, value):
+    """Coerce an extracted value to the type stored for its column"""
+    if column in NUMERIC_METRICS:
+        return parse_number(value)
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+def _metric_from_summary(file, document_type, column, name):
+    """Read a metric out of the (cached) embedding summary of a tenant's extracted document"""
+    summary = summarize_tenant_document(read_text_document(file['Key']), document_type, name)
+    response_text = complete_document_prompt(
+        METRIC_EXTRACTION_SYSTEM_PROMPT,
+        (
+            f"From the following summary of a {document_type} document, return a JSON object with the single key "
+            f'"{column}" holding '
+            + ("a number (monthly amount in dollars for income)" if column in NUMERIC_METRICS else "a short text")
+            + ", or null if it is not stated. Return only the JSON object.\n"
+        ),
+        summary,
+        temperature=0.0)
+    match = re.search(r"\{.*\}", response_text, re.DOTALL)
+    if match is None:
+        return None
+    try:
+        return json.loads(match.group(0)).get(column)
+    except (ValueError, AttributeError):
+        return None
+
+def extract_tenant_metrics(address, tenant_name, files=None):
+    """
+    Extract the comparison metrics of a tenant. Metrics set as S3 user metadata at upload are used as they are;
+    the rest are parsed from the summaries of the tenant's extracted documents.
+    """
+    if files is None:
+        files = get_files_for_tenant(address, tenant_name)
+    metrics = {column: None for column, _ in METRIC_SOURCES.values()}
+    summary_sources = {}
+    for file, metadata in zip(files, get_metadata_for_files(files)):
+        document_type = metadata.get('document_type', '').lower()
+        if document_type not in METRIC_SOURCES:
+            continue
+        column, metadata_key = METRIC_SOURCES[document_type]
+        value = _clean_metric(column, metadata.get(metadata_key))
+        if value is not None:
+            metrics[column] = value
+        elif file['Key'].endswith('.txt'):
+            summary_sources[column] = (file, document_type)
+
+    name = tenant_name.replace('_', ' ')
+    for column, (file, document_type) in summary_sources.items():
+        if metrics[column] is None:
+            metrics[column] = _clean_metric(column, _metric_from_summary(file, document_type, column, name))
+    return metrics
+
+def _load_listing_rent(address):
+    """
+    Return the stored rent of a listing, falling back to the rent recorded on its S3 folder at creation.
+    Only called while refreshing, so pages that read the store never HEAD S3 for listings without a rent.
+    """
+    rent = metrics_store.rent(address)
+    if rent is not None:
+        return rent
+    try:
+        rent = parse_number(get_metadata_for_file(f"{LISTINGS_FOLDER}{address}/").get('rent'))
+    except ClientError:
+        return None
+    if rent is not None:
+        metrics_store.set_rent(address, rent)
+    return rent
+
+def refresh_listing_metrics(address, max_workers=LLM_MAX_CONCURRENCY):
+    """
+    Bring the stored metrics of a listing in line with S3: re-extract tenants whose documents changed
+    and drop tenants that are gone. A tenant whose extraction fails keeps its old fingerprint, so the next
+    refresh retries it. Returns (number of tenants extracted, names of the tenants that failed).
+    """
+    _load_listing_rent(address)
+    invalidate_listing_cache(f"{LISTINGS_FOLDER}{address}/")
+    tenants = get_tenants_for_address(address)
+    for tenant in set(metrics_store.tenants(address)) - set(tenants):
+        metrics_store.remove(address, tenant)
+    tenant_files = get_files_for_tenants(address, tenants)
+
+    def refresh(tenant):
+        files = tenant_files[tenant]
+        fingerprint = tenant_fingerprint(files)
+        if metrics_store.fingerprint(address, tenant) == fingerprint:
+            return None
+        try:
+            metrics_store.put(address, tenant, fingerprint, extract_tenant_metrics(address, tenant, files))
+        except Exception as e:
+            print(f"Failed to extract metrics for {tenant} at {address}: {e}")
+            return False
+        return True
+
+    if not tenants:
+        return 0, []
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(tenants)))) as executor:
+        results = list(executor.map(refresh, tenants))
+    return results.count(True), [tenant for tenant, result in zip(tenants, results) if result is False]
+
+def _group_listing_objects(objects):
+    """Group listing objects into ({address}, {(address, tenant): files}); the listing folder markers only name an address"""
+    addresses = set()
+    tenant_files = {}
+    for obj in objects:
+        parts = obj['Key'][len(LISTINGS_FOLDER):].split('/', 2)
+        if not parts[0]:
+            continue
+        addresses.add(parts[0])
+        if len(parts) == 3 and parts[1] and parts[2]:
+            tenant_files.setdefault((parts[0], parts[1]), []).append(obj)
+    return addresses, tenant_files
+
+def refresh_portfolio(max_workers=LLM_MAX_CONCURRENCY, extract_metrics=True):
+    """
+    Bring the portfolio aggregates in line with S3 from a single scan of the listings folder.
+    Only tenants whose documents changed since the last refresh (or, with extract_metrics, whose metrics are
+    missing or stale) are HEADed and re-extracted; listings and tenants that disappeared are dropped.
+    Returns the number of tenants updated.
+    """
+    addresses, tenant_files = _group_listing_objects(iter_listing_objects())
+    known_addresses = set(metrics_store.listings())
+    for address in known_addresses - addresses:
+        metrics_store.remove_listing(address)
+    for address in addresses - known_addresses:
+        metrics_store.add_listing(address)
+        _load_listing_rent(address)
+    stored = metrics_store.document_fingerprints()
+    for address, tenant in set(stored) - set(tenant_files):
+        metrics_store.remove(address, tenant)
+    extracted = metrics_store.metric_fingerprints() if extract_metrics else {}
+
+    changed = []
+    for (address, tenant), files in tenant_files.items():
+        fingerprint = tenant_fingerprint(files)
+        if stored.get((address, tenant)) != fingerprint or (extract_metrics and extracted.get((address, tenant)) != fingerprint):
+            changed.append((address, tenant, files, fingerprint))
+
+    def refresh(args):
+        address, tenant, files, fingerprint = args
+        try:
+            document_types = {metadata.get('document_type', '').lower() for metadata in get_metadata_for_files(files)}
+            if extract_metrics and extracted.get((address, tenant)) != fingerprint:
+                metrics_store.put(address, tenant, fingerprint, extract_tenant_metrics(address, tenant, files))
+        except Exception as e:
+            print(f"Failed to refresh {tenant} at {address}: {e}")
+            return False
+        # Written last, so a tenant whose lookups or extraction failed is retried by the next refresh
+        documents = sum(1 for file in files if not file['Key'].endswith('.txt'))
+        metrics_store.put_documents(address, tenant, fingerprint, documents, [t for t in document_types if t])
+        return True
+
+    if not changed:
+        return 0
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(changed)))) as executor:
+        return sum(executor.map(refresh, changed))
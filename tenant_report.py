@@ -0,0 +1,171 @@
+import os
+import re
+import json
+import time
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from utils import (LLM_MAX_CONCURRENCY, complete_document_prompt, stream_document_prompt, read_text_document,
+                   get_files_for_tenant, get_metadata_for_files)
+from local_store import LOCAL_STORE_PATH, LocalStore
+
+# Precomputed reports, written by precompute_reports.py and read by the AI Analysis page
+REPORT_STORE_PATH = os.environ.get('REPORT_STORE_PATH', LOCAL_STORE_PATH)
+
+DOCUMENT_ANALYSIS_SYSTEM_PROMPT = (
+    'You work for a detail-oriented property manager and are currently '
+    'evaluating a prospective tenant. Your goal is to evaluate the tenant and '
+    'determine whether they are a good fit for the property based only on the '
+    'document provided. Pay close attention to key metrics like credit score, '
+    'income level, and job stability. Be highly suspect of any red flags.'
+)
+
+REPORT_SYSTEM_PROMPT = (
+    'You are a highly detail-oriented property manager and are currently evaluating '
+    'a prospective tenant. Your goal is to evaluate the tenant and determine whether '
+    'they are a good fit for the property based on several reports provided to you. '
+    'Pay close attention to key metrics like credit score, income level, and job '
+    'stability. Be highly suspect of any red flags.'
+)
+
+
+def escape_markdown(text, escape_asterisks=True):
+    """Escape the characters Streamlit markdown would otherwise interpret in LLM output"""
+    if escape_asterisks:
+        text = text.replace('*', '\\*')
+    text = text.replace('_', '\\_')
+    text = text.replace('\xa0', ' ')
+    text = text.replace('$', '\\$')
+    return text
+
+def analyze_tenant_document(file, document_type, name):
+    """Download a tenant's extracted .txt document and ask the LLM for a per-document analysis"""
+    file_content = read_text_document(file['Key'])
+    file_content = re.sub(r'([a-zA-Z0-9])([a-zA-Z0-9])', r'\1 \2', file_content)
+    response_text = complete_document_prompt(
+        DOCUMENT_ANALYSIS_SYSTEM_PROMPT,
+        (
+            f"Based on the following document from {name} with document type {document_type}, "
+            "provide a concise summary of all meaningful aspects of the document for your "
+            "manager"
+            f"The information you provide should help to determine whether {name} is a good fit "
+            "as a tenant. Finally, provide commentary on whether you believe this tenant is "
+            "a strong candidate.\n\n"
+        ),
+        file_content,
+        temperature=0.1
+    )
+    return escape_markdown(response_text)
+
+def iter_document_analyses(address, tenant_name, max_workers=LLM_MAX_CONCURRENCY, files=None):
+    """
+    Analyze every extracted document of a tenant concurrently.
+    Yields (index, document_type, analysis) as each analysis finishes; index is the document's position in files.
+    """
+    if files is None:
+        files = get_files_for_tenant(address, tenant_name, only_text=True)
+    if not files:
+        return
+    document_types = [metadata.get('document_type', '').lower() for metadata in get_metadata_for_files(files)]
+    name = tenant_name.replace('_', ' ')
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(files)))) as executor:
+        futures = {
+            executor.submit(analyze_tenant_document, file, document_type, name): (index, document_type)
+            for index, (file, document_type) in enumerate(zip(files, document_types))
+        }
+        for future in as_completed(futures):
+            index, document_type = futures[future]
+            yield index, document_type, future.result()
+
+def build_report_input(name, analyses):
+    """Join (document_type, analysis) pairs, in listing order, into the input of the final report"""
+    responses = ''
+    for document_type, analysis in analyses:
+        responses += (
+            f"The following is a report analyzing the document provided by {name} "
+            f"with document type {document_type}:\n\n{analysis}\n"
+        )
+    return responses
+
+def _report_user_prompt(name, address):
+    """User prompt of the final report; the per-document analyses are appended to it"""
+    return (
+        f"You are provided with several key summaries of the documents provided by the "
+        f"prospective tenant named {name} for a rental property located at {address}. "
+        "Based on these documents, write the following report with 4 sections in a markdown streamlit compatible format avoidin:\n\n"
+        "Section 1 (Key Information): A summary of all the information provided to you.\n"
+        "Section 2 (Numerical Analysis): A summary of the key numerical variables in the documents.\n"
+        "Section 3 (Tenant Evaluation and Recommendation): A summary of whether you believe this tenant is a strong candidate or not.\n"
+        "Section 4 (Final Summary): Final bullet point summary of the most important metrics and information from your analysis.\n\n"
+    )
+
+def stream_tenant_report(name, address, responses):
+    """Stream the final 4-section tenant report built from the per-document analyses"""
+    return stream_document_prompt(REPORT_SYSTEM_PROMPT, _report_user_prompt(name, address), responses, temperature=0.2)
+
+def complete_tenant_report(name, address, responses):
+    """Non-streaming variant of stream_tenant_report for batch jobs; both share the same cache entry"""
+    return complete_document_prompt(REPORT_SYSTEM_PROMPT, _report_user_prompt(name, address), responses, temperature=0.2)
+
+def tenant_fingerprint(files):
+    """Fingerprint of a tenant's extracted documents; it changes whenever a document is added, removed or replaced"""
+    digest = hashlib.sha256()
+    for file in sorted(files, key=lambda file: file['Key']):
+        digest.update(f"{file['Key']}\0{file.get('ETag', '')}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+
+class ReportStore(LocalStore):
+    """
+    Local store of precomputed tenant reports, keyed by (address, tenant).
+    Each entry remembers the fingerprint of the documents it was computed from.
+    """
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS reports ("
+        "address TEXT NOT NULL, tenant TEXT NOT NULL, fingerprint TEXT NOT NULL, "
+        "analyses TEXT NOT NULL, report TEXT NOT NULL, documents INTEGER NOT NULL, updated REAL NOT NULL, "
+        "PRIMARY KEY (address, tenant))",
+    )
+
+    def __init__(self, path: str=REPORT_STORE_PATH):
+        """
+        Create a new instance of "ReportStore".
+
+        Parameters
+        ----------
+        path: str
+            Location of the SQLite file holding the reports.
+        """
+        super().__init__(path)
+
+    def fingerprint(self, address: str, tenant: str):
+        """Return the fingerprint the stored report was computed from, or None"""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT fingerprint FROM reports WHERE address = ? AND tenant = ?", (address, tenant)).fetchone()
+        return row[0] if row else None
+
+    def get(self, address: str, tenant: str, fingerprint: str):
+        """
+        Return the stored report if it is still current.
+
+        Returns
+        -------
+        tuple
+            (analyses, report), where analyses is a list of (document_type, analysis) pairs,
+            or None when there is no report for this fingerprint.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT analyses, report FROM reports WHERE address = ? AND tenant = ? AND fingerprint = ?",
+                (address, tenant, fingerprint)).fetchone()
+        if row is None:
+            return None
+        return [tuple(analysis) for analysis in json.loads(row[0])], row[1]
+
+    def put(self, address: str, tenant: str, fingerprint: str, analyses: list, report: str):
+        """Store (or replace) the report of a tenant"""
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO reports (address, tenant, fingerprint, analyses, report, documents, updated) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (address, tenant, fingerprint, json.dumps(analyses), report, len(analyses), time.time()))
@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+
+# Relative importance of each component of the fit score; they are normalized to sum to 1
+DEFAULT_WEIGHTS = {'affordability': 0.5, 'credit': 0.4, 'references': 0.1}
+
+# Rent-to-income at or below IDEAL scores full affordability, at or above MAX scores none
+IDEAL_RENT_TO_INCOME = 25.0
+MAX_RENT_TO_INCOME = 50.0
+
+CREDIT_SCORE_MIN = 300
+CREDIT_SCORE_MAX = 850
+CREDIT_BUCKET_EDGES = [CREDIT_SCORE_MIN, 580, 670, 740, 800, CREDIT_SCORE_MAX + 1]
+CREDIT_BUCKET_LABELS = ['Poor', 'Fair', 'Good', 'Very Good', 'Exceptional']
+
+
+def rent_to_income(rent, income):
+    """Rent-to-income ratio in percent, NaN where income is missing or not positive"""
+    rent = np.asarray(rent, dtype=float)
+    income = np.asarray(income, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = np.where(income > 0, rent / income * 100, np.nan)
+    return np.round(ratio, 2)
+
+def credit_buckets(credit_scores):
+    """Bucket credit scores into the usual FICO ranges; missing or out-of-range scores get no bucket"""
+    return pd.cut(pd.Series(credit_scores, dtype=float), bins=CREDIT_BUCKET_EDGES, labels=CREDIT_BUCKET_LABELS, right=False)
+
+def score_tenants(metrics, weights=None, ideal_rent_to_income=IDEAL_RENT_TO_INCOME, max_rent_to_income=MAX_RENT_TO_INCOME):
+    """
+    Score and rank every applicant in a metrics frame as returned by MetricsStore.listing_metrics.
+
+    Each component lies in [0, 1] and a missing metric scores 0, so incomplete applications rank lower.
+    The fit score is the weighted mean of the components on a 0-100 scale.
+
+    Parameters
+    ----------
+    metrics: pd.DataFrame
+        One row per applicant with address, tenant, credit_score, monthly_income, references_note and rent.
+    weights: dict
+        Weights of the 'affordability', 'credit' and 'references' components; defaults to DEFAULT_WEIGHTS.
+    ideal_rent_to_income: float
+        Rent-to-income percentage that still scores full affordability.
+    max_rent_to_income: float
+        Rent-to-income percentage from which affordability scores 0.
+
+    Returns
+    -------
+    pd.DataFrame
+        The metrics with rent_to_income, credit_bucket, the component scores, fit_score and the rank
+        of each applicant within its listing, sorted from best to worst fit.
+    """
+    weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+    total_weight = sum(weights.values())
+    if total_weight <= 0:
+        raise ValueError("At least one scoring weight must be positive")
+
+    scored = metrics.copy()
+    scored['rent_to_income'] = rent_to_income(scored['rent'], scored['monthly_income'])
+    scored['credit_bucket'] = credit_buckets(scored['credit_score']).values
+
+    span = max(max_rent_to_income - ideal_rent_to_income, 1e-9)
+    affordability = np.clip((max_rent_to_income - scored['rent_to_income'].to_numpy()) / span, 0.0, 1.0)
+    credit_score = scored['credit_score'].to_numpy(dtype=float)
+    credit = np.clip((credit_score - CREDIT_SCORE_MIN) / (CREDIT_SCORE_MAX - CREDIT_SCORE_MIN), 0.0, 1.0)
+    scored['affordability_component'] = np.nan_to_num(affordability)
+    scored['credit_component'] = np.nan_to_num(credit)
+    scored['references_component'] = scored['references_note'].notna().to_numpy(dtype=float)
+
+    scored['fit_score'] = np.round(100 * (
+        weights['affordability'] * scored['affordability_component']
+        + weights['credit'] * scored['credit_component']
+        + weights['references'] * scored['references_component']
+    ) / total_weight, 1)
+    scored['rank'] = scored.groupby('address')['fit_score'].rank(ascending=False, method='min').astype(int)
+    return scored.sort_values(['fit_score', 'address', 'tenant'], ascending=[False, True, True], ignore_index=True)
+
+def top_applicants(scored, n, per_listing=False):
+    """Return the n best applicants overall, or the n best of each listing when per_listing is set"""
+    if per_listing:
+        return scored[scored['rank'] <= n].sort_values(['address', 'rank'], ignore_index=True)
+    return scored.head(n)
@@ -2,9 +2,15 @@ from pytesseract import pytesseract
 from pytesseract import image_to_string
 from PIL import Image
 from io import BytesIO
+import os
+import time
 import pypdfium2 as pdfium
 import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pdf2image import convert_from_bytes
+# Pages with fewer extractable characters than this are treated as scanned and OCR'd
+MIN_NATIVE_TEXT_CHARS = 50
 # Set the path for tesseract
 pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'  # Change this to the path where tesseract is installed
 
@@ -34,3 +40,126 @@ def extract_text_with_pytesseract(list_dict_final_images):
         image_content.append(raw_text)
     
     return "\n".join(image_content) 
+
+
+# The PDF each OCR worker process renders pages from, opened once per process by _init_ocr_worker
+_worker_pdf = None
+
+
+def _pdf_bytes(file_bytes):
+    """Accept either the BytesIO used by convert_pdf_to_images or raw bytes"""
+    if isinstance(file_bytes, BytesIO):
+        return file_bytes.getvalue()
+    return bytes(file_bytes)
+
+
+def _init_ocr_worker(pdf_bytes, tesseract_cmd):
+    global _worker_pdf
+    pytesseract.tesseract_cmd = tesseract_cmd
+    _worker_pdf = pdfium.PdfDocument(pdf_bytes)
+
+
+def _ocr_page(index, dpi):
+    """Render one page of the worker's PDF and OCR it"""
+    page = _worker_pdf[index]
+    try:
+        image = page.render(scale=dpi / 72).to_pil()
+    finally:
+        page.close()
+    return str(image_to_string(image))
+
+
+def iter_ocr_pdf_pages(file_bytes, dpi=300, max_workers=None):
+    """
+    OCR a PDF in a process pool and yield the text of each page, in page order.
+    Pages are rendered lazily inside the workers and only a couple of pages per worker are in flight,
+    so peak memory stays at a few rendered pages regardless of the document length.
+    """
+    pdf_bytes = _pdf_bytes(file_bytes)
+    pdf = pdfium.PdfDocument(pdf_bytes)
+    page_count = len(pdf)
+    pdf.close()
+    if page_count == 0:
+        return
+
+    workers = max(1, min(max_workers or os.cpu_count() or 1, page_count))
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_ocr_worker,
+                                   initargs=(pdf_bytes, pytesseract.tesseract_cmd))
+    pending = deque()
+    next_page = 0
+    try:
+        while next_page < page_count or pending:
+            while next_page < page_count and len(pending) < workers * 2:
+                pending.append(executor.submit(_ocr_page, next_page, dpi))
+                next_page += 1
+            yield pending.popleft().result()
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def _timed_ocr_page(index, dpi):
+    started = time.perf_counter()
+    text = _ocr_page(index, dpi)
+    return text, time.perf_counter() - started
+
+
+def _native_page_text(pdf, index):
+    """Pull the embedded text layer of a page, if it has one"""
+    page = pdf[index]
+    try:
+        textpage = page.get_textpage()
+        try:
+            return textpage.get_text_range()
+        finally:
+            textpage.close()
+    finally:
+        page.close()
+
+
+def iter_pdf_text(file_bytes, min_chars=MIN_NATIVE_TEXT_CHARS, dpi=300, max_workers=None):
+    """
+    Extract the text of a PDF page by page, in order, using the native text layer where there is one.
+    Only pages with fewer than min_chars extractable characters are rendered and OCR'd in a process pool.
+    Yields one dict per page: {'page': index, 'text': str, 'source': 'native' or 'ocr', 'seconds': float}.
+    """
+    pdf_bytes = _pdf_bytes(file_bytes)
+    pdf = pdfium.PdfDocument(pdf_bytes)
+    page_count = len(pdf)
+    workers = max(1, min(max_workers or os.cpu_count() or 1, page_count or 1))
+    executor = None
+    # Pages waiting to be yielded in order: either a finished result or a running OCR future
+    pending = deque()
+    try:
+        for index in range(page_count):
+            started = time.perf_counter()
+            text = _native_page_text(pdf, index)
+            if len(text.strip()) >= min_chars:
+                pending.append({'page': index, 'text': text, 'source': 'native', 'seconds': time.perf_counter() - started})
+            else:
+                if executor is None:
+                    executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_ocr_worker,
+                                                   initargs=(pdf_bytes, pytesseract.tesseract_cmd))
+                pending.append((index, executor.submit(_timed_ocr_page, index, dpi)))
+
+            # Yield whatever is ready at the front, and block once too many OCR pages are in flight
+            while pending and (isinstance(pending[0], dict) or pending[0][1].done() or len(pending) > workers * 2):
+                yield _resolve_page(pending.popleft())
+        while pending:
+            yield _resolve_page(pending.popleft())
+    finally:
+        pdf.close()
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+def _resolve_page(entry):
+    """Turn a pending page of iter_pdf_text into its result dict, waiting for OCR if needed"""
+    if isinstance(entry, dict):
+        return entry
+    index, future = entry
+    text, seconds = future.result()
+    return {'page': index, 'text': text, 'source': 'ocr', 'seconds': seconds}
+
+
+def extract_text_from_pdf(file_bytes, dpi=300, max_workers=None):
+    return "\n".join(page['text'] for page in iter_pdf_text(file_bytes, dpi=dpi, max_workers=max_workers))
@@ -0,0 +1,100 @@
+import os
+import time
+import hashlib
+import threading
+from local_store import LOCAL_STORE_PATH, LocalStore
+
+THUMBNAIL_CACHE_DIR = os.environ.get('THUMBNAIL_CACHE_DIR', os.path.join('db', 'thumbnails'))
+# The index of the thumbnail files is kept with the other local stores
+THUMBNAIL_INDEX_PATH = os.environ.get('THUMBNAIL_INDEX_PATH', LOCAL_STORE_PATH)
+THUMBNAIL_CACHE_MAX_BYTES = int(os.environ.get('THUMBNAIL_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+
+
+class ThumbnailCache(LocalStore):
+    """
+    Size-bounded disk cache of rendered page thumbnails.
+    Thumbnails are keyed by S3 key, ETag and page number, so a replaced document never serves stale previews,
+    and the least recently used files are deleted once the cache exceeds max_bytes.
+    """
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS thumbnails (name TEXT PRIMARY KEY, size INTEGER NOT NULL, last_used REAL NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS thumbnails_last_used ON thumbnails (last_used)",
+        "CREATE TABLE IF NOT EXISTS page_counts (document TEXT PRIMARY KEY, pages INTEGER NOT NULL)",
+    )
+
+    def __init__(self, directory: str=THUMBNAIL_CACHE_DIR, max_bytes: int=THUMBNAIL_CACHE_MAX_BYTES,
+                 path: str=THUMBNAIL_INDEX_PATH):
+        """
+        Create a new instance of "ThumbnailCache".
+
+        Parameters
+        ----------
+        directory: str
+            Directory holding the thumbnail files.
+        max_bytes: int
+            Upper bound on the total size of the thumbnail files.
+        path: str
+            Location of the SQLite file holding the thumbnail index.
+        """
+        super().__init__(path)
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def _document(key: str, etag: str) -> str:
+        """Identify one version of an S3 object"""
+        return hashlib.sha1(f"{key}\0{etag}".encode('utf-8')).hexdigest()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, f"{name}.jpg")
+
+    def get(self, key: str, etag: str, page: int):
+        """Return the cached thumbnail of a page as JPEG bytes, or None"""
+        name = f"{self._document(key, etag)}-{page}"
+        try:
+            with open(self._path(name), 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        with self._lock, self._connection:
+            self._connection.execute("UPDATE thumbnails SET last_used = ? WHERE name = ?", (time.time(), name))
+        return data
+
+    def put(self, key: str, etag: str, page: int, data: bytes):
+        """Store the thumbnail of a page and evict the least recently used thumbnails beyond max_bytes"""
+        name = f"{self._document(key, etag)}-{page}"
+        path = self._path(name)
+        temporary = f"{path}.{threading.get_ident()}.tmp"
+        with open(temporary, 'wb') as f:
+            f.write(data)
+        os.replace(temporary, path)
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO thumbnails (name, size, last_used) VALUES (?, ?, ?)", (name, len(data), time.time()))
+            total = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM thumbnails").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            for old_name, size in self._connection.execute(
+                    "SELECT name, size FROM thumbnails WHERE name != ? ORDER BY last_used", (name,)).fetchall():
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(self._path(old_name))
+                except FileNotFoundError:
+                    pass
+                self._connection.execute("DELETE FROM thumbnails WHERE name = ?", (old_name,))
+                total -= size
+
+    def page_count(self, key: str, etag: str):
+        """Return the cached page count of a document, or None"""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT pages FROM page_counts WHERE document = ?", (self._document(key, etag),)).fetchone()
+        return row[0] if row else None
+
+    def set_page_count(self, key: str, etag: str, pages: int):
+        """Remember the page count of a document"""
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO page_counts (document, pages) VALUES (?, ?)", (self._document(key, etag), pages))
@@ -1,18 +1,28 @@
 import streamlit as st
-import boto3
-from botocore.client import Config
 from io import BytesIO
 from embedchain import App
+from embedchain.config import AppConfig, ChromaDbConfig
 import os
-import requests
-import tempfile
-import base64
-from openai import OpenAI
+import hashlib
+import time
+import random
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from chardet.universaldetector import UniversalDetector
+from openai import OpenAI, RateLimitError, APIConnectionError, APITimeoutError, InternalServerError
+from summary_cache import SummaryCache
+from subscription_cache import SubscriptionCache
+from bot_manifest import BotManifest
+from metrics_store import MetricsStore
+from document_ingestion import ingest_documents
+from s3_access import S3Access, make_s3_client, read_body
 
 from dotenv import load_dotenv
 load_dotenv()
 client = OpenAI(api_key=os.environ["OPENAI_API_KEY"])
 import stripe
+stripe.api_key = os.getenv("STRIPE_API_KEY")
 
 
 # AWS Credentials from OS environment variables
@@ -21,54 +31,207 @@ AWS_SECRET_ACCESS_KEY = os.environ.get('AWS_SECRET_ACCESS_KEY')
 BUCKET_NAME = os.environ.get('BUCKET_NAME')
 LISTINGS_FOLDER = "listings/"
 
-# Initialize S3 clients
-s3 = boto3.client('s3', aws_access_key_id=AWS_ACCESS_KEY_ID, aws_secret_access_key=AWS_SECRET_ACCESS_KEY, config=Config(region_name='eu-north-1',signature_version='s3v4'))
+# Metadata index settings: how long a HEADed object's metadata is trusted
+METADATA_TTL_SECONDS = int(os.environ.get('METADATA_TTL_SECONDS', 900))
 
-# Initialize the chatbot instance
+# How long a LIST result is reused, per level of the listings folder, so widget reruns don't hit S3
+LISTINGS_TTL_SECONDS = int(os.environ.get('LISTINGS_TTL_SECONDS', 120))
+TENANTS_TTL_SECONDS = int(os.environ.get('TENANTS_TTL_SECONDS', 60))
+FILES_TTL_SECONDS = int(os.environ.get('FILES_TTL_SECONDS', 30))
 
+# LLM settings: how many documents are summarized at once and how often a throttled request is retried
+LLM_MAX_CONCURRENCY = int(os.environ.get('LLM_MAX_CONCURRENCY', 4))
+LLM_MAX_RETRIES = int(os.environ.get('LLM_MAX_RETRIES', 5))
+
+# Encoding detection only samples this many bytes of a document that is not valid UTF-8
+ENCODING_SAMPLE_BYTES = 64 * 1024
+ENCODING_CACHE_SIZE = 4096
+
+# Initialize S3 clients: one pooled client with adaptive retries, and a fan-out layer on top of it
+s3 = make_s3_client(AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY)
+s3_access = S3Access(s3, BUCKET_NAME)
+
+# Persistent cache of LLM responses, shared by the bot builder and the analysis pages
+summary_cache = SummaryCache()
+
+# Persistent cache of Stripe subscription status, so gated pages don't call Stripe on every check
+subscription_cache = SubscriptionCache()
+
+# Which S3 documents are already embedded in each tenant's Chroma collection
+bot_manifest = BotManifest()
+
+# Structured tenant metrics and listing rents, read by the comparison dashboard
+metrics_store = MetricsStore()
+
+
+def _fetch_subscription_status(email):
+    """Ask Stripe whether email has an active subscription; returns (subscribed, customer_ids)"""
+    # One request: the customers with this email and their (non-canceled) subscriptions
+    customers = stripe.Customer.list(email=email, expand=['data.subscriptions'])
+    customer_ids = []
+    subscribed = False
+    for customer in customers.auto_paging_iter():
+        customer_ids.append(customer.id)
+        subscriptions = customer.get('subscriptions')
+        if subscriptions and any(subscription['status'] == 'active' for subscription in subscriptions.data):
+            subscribed = True
+    return subscribed, customer_ids
 
 def is_email_subscribed(email):
-    # Initialize the Stripe API with the given key
-    stripe.api_key = os.getenv("STRIPE_API_KEY")
-
-    # List customers with the given email address
-    customers = stripe.Customer.list(email=email)
-
-    for customer in customers:
-        # For each customer, list their subscriptions
-        subscriptions = stripe.Subscription.list(customer=customer.id)
-        
-        # If any active subscription is found, return True
-        for subscription in subscriptions:
-            if subscription['status'] == 'active':
-                return True
-
-    # If no active subscriptions found, return False
-    print(f"No active subscriptions found for {email}")
-    return False
-
-def save_listing(address):
-    """Create a 'folder' for the listing in S3"""
+    """Check whether email has an active Stripe subscription, answering from the local cache when possible"""
+    subscribed = subscription_cache.get(email)
+    if subscribed is not None:
+        return subscribed
+
+    subscribed, customer_ids = _fetch_subscription_status(email)
+    subscription_cache.put(email, subscribed, customer_ids)
+    if not subscribed:
+        print(f"No active subscriptions found for {email}")
+    return subscribed
+
+def invalidate_subscription(email=None, customer_id=None):
+    """
+    Drop and re-fetch the cached subscription status of an email and/or a Stripe customer.
+    Returns the emails that were refreshed.
+    """
+    emails = set()
+    if email:
+        emails.add(email)
+    if customer_id:
+        emails.update(subscription_cache.emails_for_customer(customer_id))
+    for affected_email in emails:
+        subscription_cache.invalidate(affected_email)
+        subscribed, customer_ids = _fetch_subscription_status(affected_email)
+        subscription_cache.put(affected_email, subscribed, customer_ids)
+    return sorted(emails)
+
+def handle_stripe_event(event):
+    """
+    Local stand-in for a Stripe webhook endpoint: refresh the cached status of whoever a
+    customer.subscription.*, checkout.session.completed or invoice.* event is about.
+    """
+    event_type = event['type']
+    if not (event_type.startswith('customer.subscription.') or event_type.startswith('invoice.')
+            or event_type == 'checkout.session.completed'):
+        return []
+    obj = event['data']['object']
+    email = obj.get('customer_email') or (obj.get('customer_details') or {}).get('email')
+    return invalidate_subscription(email=email, customer_id=obj.get('customer'))
+
+def save_listing(address, rent=None):
+    """Create a 'folder' for the listing in S3, recording its monthly rent when given"""
     address = address.replace(" ", "")
     key = f"{LISTINGS_FOLDER}{address}/"
-    s3.put_object(Bucket=BUCKET_NAME, Key=key)
+    if rent is None:
+        s3.put_object(Bucket=BUCKET_NAME, Key=key)
+        metrics_store.add_listing(address)
+    else:
+        s3.put_object(Bucket=BUCKET_NAME, Key=key, Metadata={'rent': str(rent)})
+        metrics_store.set_rent(address, float(rent))
+    # The new listing must show up on the next rerun
+    with _listing_lock:
+        _listing_cache.pop(LISTINGS_FOLDER, None)
+    invalidate_listing_cache(key)
 
     
+def _iter_list_pages(prefix, delimiter=None, page_size=None, start_after=None, end_before=None):
+    """
+    Yield (objects, common_prefixes) one list_objects_v2 page at a time, following continuation tokens.
+
+    start_after and end_before are relative to prefix and bound the listed key range:
+    only keys greater than prefix + start_after and less than prefix + end_before are listed.
+    With a delimiter they name common prefixes, and the start_after prefix itself is excluded,
+    so a listing can be resumed from the last name it yielded.
+    """
+    params = {'Bucket': BUCKET_NAME, 'Prefix': prefix}
+    if delimiter:
+        params['Delimiter'] = delimiter
+    if page_size:
+        params['MaxKeys'] = page_size
+    skip_prefix = None
+    if start_after:
+        params['StartAfter'] = f"{prefix}{start_after}"
+        if delimiter:
+            # Keys below start_after + delimiter sort after StartAfter and roll up into that common prefix
+            skip_prefix = f"{prefix}{start_after}{delimiter}"
+    stop_key = f"{prefix}{end_before}" if end_before else None
+
+    while True:
+        response = s3.list_objects_v2(**params)
+        objects = response.get('Contents', [])
+        common_prefixes = [common['Prefix'] for common in response.get('CommonPrefixes', [])
+                           if common['Prefix'] != skip_prefix]
+        past_end = False
+        if stop_key is not None:
+            in_range_objects = [obj for obj in objects if obj['Key'] < stop_key]
+            in_range_prefixes = [common for common in common_prefixes if common < stop_key]
+            past_end = len(in_range_objects) < len(objects) or len(in_range_prefixes) < len(common_prefixes)
+            objects, common_prefixes = in_range_objects, in_range_prefixes
+        if objects or common_prefixes:
+            yield objects, common_prefixes
+        if past_end or not response.get('IsTruncated'):
+            return
+        params['ContinuationToken'] = response['NextContinuationToken']
+
+def iter_created_listings(page_size=None, start_after=None, end_before=None):
+    """Yield the created addresses from S3 page by page"""
+    for _, common_prefixes in _iter_list_pages(LISTINGS_FOLDER, '/', page_size, start_after, end_before):
+        for prefix in common_prefixes:
+            yield prefix.replace(LISTINGS_FOLDER, '').rstrip('/')
+
+def iter_tenants_for_address(address, page_size=None, start_after=None, end_before=None):
+    """Yield the tenants who have applied for the given address page by page"""
+    prefix = f"{LISTINGS_FOLDER}{address}/"
+    for _, common_prefixes in _iter_list_pages(prefix, '/', page_size, start_after, end_before):
+        for tenant in common_prefixes:
+            yield tenant.split('/')[-2]
+
+def iter_files_for_tenant(address, tenant_name, only_text=False, page_size=None, start_after=None, end_before=None):
+    """Yield the files uploaded by a specific tenant for the given address page by page"""
+    prefix = f"{LISTINGS_FOLDER}{address}/{tenant_name}/"
+    for objects, _ in _iter_list_pages(prefix, None, page_size, start_after, end_before):
+        for file in objects:
+            if only_text and not file['Key'].endswith('.txt'):
+                continue
+            yield file
+
+def iter_listing_objects(page_size=None):
+    """Yield every object under the listings folder (listing folders, tenant uploads and extracted text) page by page"""
+    for objects, _ in _iter_list_pages(LISTINGS_FOLDER, None, page_size):
+        yield from objects
+
+# LIST results keyed by S3 prefix -> (fetched_at, items)
+_listing_cache = {}
+_listing_lock = threading.Lock()
+
+def _cached_listing(prefix, ttl, fetch):
+    """Return the items listed under prefix, calling fetch only when the cached listing is older than ttl"""
+    now = time.time()
+    with _listing_lock:
+        entry = _listing_cache.get(prefix)
+    if entry is not None and now - entry[0] <= ttl:
+        return list(entry[1])
+    items = list(fetch())
+    with _listing_lock:
+        _listing_cache[prefix] = (now, items)
+    return list(items)
+
+def invalidate_listing_cache(prefix=None):
+    """Drop cached listings of prefix and everything below it, or the whole cache when no prefix is given"""
+    with _listing_lock:
+        if prefix is None:
+            _listing_cache.clear()
+            return
+        for key in [key for key in _listing_cache if key.startswith(prefix)]:
+            del _listing_cache[key]
+
 def fetch_created_listings():
     """Fetch the list of created addresses from S3"""
-    response = s3.list_objects_v2(Bucket=BUCKET_NAME, Prefix=LISTINGS_FOLDER, Delimiter='/')
-    if 'CommonPrefixes' not in response:
-        return []
-    return [prefix['Prefix'].replace(LISTINGS_FOLDER, '').rstrip('/') for prefix in response['CommonPrefixes']]
+    return _cached_listing(LISTINGS_FOLDER, LISTINGS_TTL_SECONDS, iter_created_listings)
 
 def get_tenants_for_address(address):
     """Get the list of tenants who have applied for the given address"""
-    prefix = f"{LISTINGS_FOLDER}{address}/"
-    response = s3.list_objects_v2(Bucket=BUCKET_NAME, Prefix=prefix, Delimiter='/')
-    if 'CommonPrefixes' not in response:
-        return []
-    tenants = [tenant['Prefix'].split('/')[-2] for tenant in response['CommonPrefixes']]
-    return tenants
+    return _cached_listing(f"{LISTINGS_FOLDER}{address}/", TENANTS_TTL_SECONDS, lambda: iter_tenants_for_address(address))
 
 def download_file_from_s3(bucket_name, object_name):
     """Download a file from S3 and return it as bytes"""
@@ -78,16 +241,49 @@ def download_file_from_s3(bucket_name, object_name):
     except s3.exceptions.NoSuchKey:
         return None
     
-def download_from_presigned_url(presigned_url):
-    """Download a file from a presigned URL and return the path to the temporary file."""
-    response = requests.get(presigned_url, stream=True)
-    response.raise_for_status()  # Raise an exception for HTTP errors
-
-    # Create a temporary file and write the content to it
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".txt") as tmp_file:
-        tmp_file.write(response.content)
-        return tmp_file.name
-    
+def read_document_bytes(object_name):
+    """Stream an S3 object's body into memory through the pooled client and return it as bytes"""
+    return s3_access.get(object_name)
+
+# Encodings detected for non UTF-8 documents, keyed by ETag, so a document is only sniffed once
+_encoding_cache = OrderedDict()
+_encoding_lock = threading.Lock()
+
+def detect_encoding(data):
+    """Detect the text encoding of a document from a bounded prefix of its bytes"""
+    detector = UniversalDetector()
+    detector.feed(data[:ENCODING_SAMPLE_BYTES])
+    detector.close()
+    return detector.result['encoding'] or 'utf-8'
+
+def decode_document(data, etag=None):
+    """
+    Decode a text document in one pass.
+    Tries strict UTF-8 first and only falls back to chardet, whose result is remembered per ETag.
+    """
+    try:
+        return data.decode('utf-8')
+    except UnicodeDecodeError:
+        pass
+    with _encoding_lock:
+        encoding = _encoding_cache.get(etag) if etag else None
+    if encoding is None:
+        encoding = detect_encoding(data)
+        if etag:
+            with _encoding_lock:
+                _encoding_cache[etag] = encoding
+                while len(_encoding_cache) > ENCODING_CACHE_SIZE:
+                    _encoding_cache.popitem(last=False)
+    try:
+        return data.decode(encoding, errors='replace')
+    except LookupError:
+        return data.decode('utf-8', errors='replace')
+
+def read_text_document(object_name):
+    """Read an extracted .txt document from S3 and decode it, without touching the disk"""
+    response = s3.get_object(Bucket=BUCKET_NAME, Key=object_name)
+    return decode_document(read_body(response), response.get('ETag'))
+
 def generate_presigned_url(bucket_name, object_name, expiration=3600):
     """Generate a presigned URL to share an S3 object"""
     url = s3.generate_presigned_url('get_object',
@@ -113,100 +309,346 @@ def determine_data_type(file_name):
 
 def get_files_for_tenant(address, tenant_name, only_text=False):
     """Get the list of files uploaded by a specific tenant for the given address"""
-    prefix = f"{LISTINGS_FOLDER}{address}/{tenant_name}/"
-    response = s3.list_objects_v2(Bucket=BUCKET_NAME, Prefix=prefix)
-    if 'Contents' not in response:
-        return []
+    files = _cached_listing(f"{LISTINGS_FOLDER}{address}/{tenant_name}/", FILES_TTL_SECONDS,
+                            lambda: iter_files_for_tenant(address, tenant_name))
     if only_text:
-        return [file for file in response['Contents'] if file['Key'].endswith('.txt')]
-    else:
-        return response['Contents']
+        return [file for file in files if file['Key'].endswith('.txt')]
+    return files
+
+def get_files_for_tenants(address, tenant_names):
+    """
+    Get the files of several tenants of an address as {tenant_name: files}; the tenants whose
+    cached listing expired are listed concurrently.
+    """
+    prefixes = {tenant_name: f"{LISTINGS_FOLDER}{address}/{tenant_name}/" for tenant_name in tenant_names}
+    now = time.time()
+    files = {}
+    with _listing_lock:
+        for tenant_name, prefix in prefixes.items():
+            entry = _listing_cache.get(prefix)
+            if entry is not None and now - entry[0] <= FILES_TTL_SECONDS:
+                files[tenant_name] = list(entry[1])
+    missing = [tenant_name for tenant_name in tenant_names if tenant_name not in files]
+    listed = s3_access.list_many([prefixes[tenant_name] for tenant_name in missing])
+    with _listing_lock:
+        for tenant_name, result in zip(missing, listed):
+            _listing_cache[prefixes[tenant_name]] = (now, result['objects'])
+            files[tenant_name] = list(result['objects'])
+    return files
 
 def get_metadata_for_file(file_key):
     """Get the metadata for a specific file in S3"""
     response = s3.head_object(Bucket=BUCKET_NAME, Key=file_key)
     return response['Metadata']
 
+# Object metadata keyed by S3 key -> (ETag, LastModified, fetched_at, metadata)
+_metadata_cache = {}
+_metadata_lock = threading.Lock()
+
+def _cached_metadata(file, now):
+    """Return cached metadata for a listed object if its ETag/LastModified still match and the entry is fresh"""
+    entry = _metadata_cache.get(file['Key'])
+    if entry is None:
+        return None
+    etag, last_modified, fetched_at, metadata = entry
+    if etag != file.get('ETag') or last_modified != file.get('LastModified'):
+        return None
+    if now - fetched_at > METADATA_TTL_SECONDS:
+        return None
+    return metadata
+
+def get_metadata_for_files(files):
+    """
+    Get the metadata for a batch of objects returned by list_objects_v2.
+    Objects whose ETag/LastModified match the cache are not HEADed again; the rest are HEADed concurrently.
+    Returns the metadata dicts in the same order as files.
+    """
+    now = time.time()
+    metadata_by_key = {}
+    missing = []
+    with _metadata_lock:
+        for file in files:
+            metadata = _cached_metadata(file, now)
+            if metadata is None:
+                missing.append(file)
+            else:
+                metadata_by_key[file['Key']] = metadata
+
+    if missing:
+        fetched = [response['Metadata'] for response in s3_access.head_many([file['Key'] for file in missing])]
+        fetched_at = time.time()
+        with _metadata_lock:
+            for file, metadata in zip(missing, fetched):
+                _metadata_cache[file['Key']] = (file.get('ETag'), file.get('LastModified'), fetched_at, metadata)
+                metadata_by_key[file['Key']] = metadata
+
+    return [metadata_by_key[file['Key']] for file in files]
+
+def get_metadata_index(address, tenant_name=None):
+    """
+    Get the metadata for every object under a listing (or a single tenant of a listing) in one batch.
+    Returns a dict mapping S3 key -> metadata.
+    """
+    if tenant_name is None:
+        prefix = f"{LISTINGS_FOLDER}{address}/"
+    else:
+        prefix = f"{LISTINGS_FOLDER}{address}/{tenant_name}/"
+    files = []
+    for objects, _ in _iter_list_pages(prefix):
+        files.extend(file for file in objects if not file['Key'].endswith('/'))
+    return dict(zip([file['Key'] for file in files], get_metadata_for_files(files)))
+
+def invalidate_metadata_cache(prefix=None):
+    """Drop cached metadata for every key under prefix, or the whole cache when no prefix is given"""
+    with _metadata_lock:
+        if prefix is None:
+            _metadata_cache.clear()
+            return
+        for key in [key for key in _metadata_cache if key.startswith(prefix)]:
+            del _metadata_cache[key]
+
 def list_files_for_tenant(address, tenant_name):
     """List all the files uploaded by a specific tenant for the given address"""
     files = get_files_for_tenant(address, tenant_name)
     file_names = [file['Key'] for file in files]
     return file_names, files
 
-def extract_url_from_txt(file_path):
-    """Extract the URL from a .txt file"""
-    with open(file_path, 'r') as file:
-        return file.read().strip()
-    
-@st.cache_resource
-def create_bot(selected_address, selected_tenant):
-    # Embed the documents into the bot
-    bot = App(system_prompt=f"You are a tenant named {selected_tenant} who is interested in renting the unit at {selected_address}. You are currently being interviewed to determine if you are a good fit for the unit. You will be asked questions about the documents you have uploaded.")
-    files = get_files_for_tenant(selected_address, selected_tenant, only_text=True)
-    for file in files:
-        presigned_url = generate_presigned_url(BUCKET_NAME, file['Key'])
-        local_file_path = download_from_presigned_url(presigned_url)
-        
-        # Fetch metadata for the file
-        metadata = get_metadata_for_file(BUCKET_NAME, file['Key'])
-        document_type = metadata.get('document_type', '').lower()
-        print('hi')
-        st.write(document_type)
-        st.write(local_file_path)
-        # Read the content of the file
-        with open(local_file_path, 'r', encoding='utf-8') as f:
-            file_content = f.read()
-        name = selected_tenant.replace('_', ' ')  # This should be fetched dynamically
-        address = selected_address
-        response = client.chat.completions.create(model="gpt-3.5-turbo-0125",
+def _retry_after_seconds(error):
+    """Read the Retry-After header from an OpenAI error response, if there is one"""
+    response = getattr(error, 'response', None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get('retry-after'))
+    except (TypeError, ValueError):
+        return None
+
+# Running totals of LLM requests and tokens in this process, read by batch jobs to report throughput
+llm_usage = {'requests': 0, 'prompt_tokens': 0, 'completion_tokens': 0}
+_llm_usage_lock = threading.Lock()
+
+def _record_llm_usage(response):
+    """Add a completed response's token usage to the process totals"""
+    usage = getattr(response, 'usage', None)
+    with _llm_usage_lock:
+        llm_usage['requests'] += 1
+        if usage is not None:
+            llm_usage['prompt_tokens'] += usage.prompt_tokens
+            # Embedding responses only report prompt tokens
+            llm_usage['completion_tokens'] += getattr(usage, 'completion_tokens', 0)
+
+def _call_with_retry(create, max_retries=LLM_MAX_RETRIES):
+    """Call an OpenAI request, backing off exponentially (or as told by Retry-After) on rate limits and transient errors"""
+    delay = 1.0
+    for attempt in range(max_retries + 1):
+        try:
+            response = create()
+            _record_llm_usage(response)
+            return response
+        except (RateLimitError, APIConnectionError, APITimeoutError, InternalServerError) as e:
+            if attempt == max_retries:
+                raise
+            wait = _retry_after_seconds(e)
+            if wait is None:
+                wait = delay + random.uniform(0, delay)
+            print(f"OpenAI request failed with {e.__class__.__name__}, retrying in {wait:.1f} seconds.")
+            time.sleep(wait)
+            delay = min(delay * 2, 30)
+
+def chat_completion_with_retry(max_retries=LLM_MAX_RETRIES, **kwargs):
+    """Create a chat completion with retries on rate limits and transient errors"""
+    return _call_with_retry(lambda: client.chat.completions.create(**kwargs), max_retries)
+
+def embed_texts(texts, model="text-embedding-ada-002", max_retries=LLM_MAX_RETRIES):
+    """Embed a batch of texts in a single request, returning the vectors in input order"""
+    response = _call_with_retry(lambda: client.embeddings.create(input=list(texts), model=model), max_retries)
+    return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+def complete_document_prompt(system_prompt, user_prompt, document, model="gpt-3.5-turbo-0125", temperature=0.0):
+    """
+    Ask the LLM about a single document, appended to user_prompt in a code fence.
+    Responses are served from the summary cache when the document, prompts, model and temperature are unchanged.
+    """
+    def create():
+        response = chat_completion_with_retry(
+            model=model,
+            messages=[
+                {'role': 'system', 'content': system_prompt},
+                {'role': 'user', 'content': f"{user_prompt}```{document}```"}
+            ],
+            temperature=temperature)
+        return response.choices[0].message.content
+    return summary_cache.get_or_create(document, f"{system_prompt}\n{user_prompt}", model, temperature, create)
+
+def stream_document_prompt(system_prompt, user_prompt, document, model="gpt-3.5-turbo-0125", temperature=0.0):
+    """
+    Streaming variant of complete_document_prompt that yields the response as it is generated.
+    A cached response is yielded in one piece; a fresh one is cached once the stream completes.
+    """
+    key = summary_cache.make_key(document, f"{system_prompt}\n{user_prompt}", model, temperature)
+    cached = summary_cache.get(key)
+    if cached is not None:
+        yield cached
+        return
+
+    stream = chat_completion_with_retry(
+        model=model,
         messages=[
-              {'role': 'system', 'content': f'You are very detail oriented property management analyst, who carefully reads all details of an unstructured document and creates a structured document containing all key pieces of information that would be helpful for analyzing the tenant.'},
-            {"role": "user", "content": f"Based on the following messy document from {name} with document type {document_type}, provide a summary of the document. Carefully report all key metrics. Do not provide your own commentary. Just summarize very carefully. Only include information that would be important for determining whether the tenant is a good fit for the rental property. Don't include anything about disclaimers or stuff like that. Here is the document: \n ```{file_content}```"}
+            {'role': 'system', 'content': system_prompt},
+            {'role': 'user', 'content': f"{user_prompt}```{document}```"}
         ],
+        temperature=temperature,
+        stream=True)
+    parts = []
+    for chunk in stream:
+        if not chunk.choices:
+            continue
+        text = chunk.choices[0].delta.content
+        if text:
+            parts.append(text)
+            yield text
+    summary_cache.put(key, ''.join(parts))
+
+def stream_to_placeholder(placeholder, chunks, transform=None, flush_interval=0.1):
+    """
+    Render streamed text chunks into a Streamlit placeholder, redrawing at most once per flush_interval seconds.
+    Returns the full text.
+    """
+    parts = []
+    last_flush = 0.0
+    for chunk in chunks:
+        parts.append(chunk)
+        now = time.monotonic()
+        if now - last_flush >= flush_interval:
+            text = ''.join(parts)
+            placeholder.markdown((transform(text) if transform else text) + "▌")
+            last_flush = now
+    text = ''.join(parts)
+    placeholder.markdown(transform(text) if transform else text)
+    return text
+
+def summarize_tenant_document(file_content, document_type, name):
+    """Summarize the text of a tenant document for embedding"""
+    response_text = complete_document_prompt(
+        'You are very detail oriented property management analyst, who carefully reads all details of an unstructured document and creates a structured document containing all key pieces of information that would be helpful for analyzing the tenant.',
+        f"Based on the following messy document from {name} with document type {document_type}, provide a summary of the document. Carefully report all key metrics. Do not provide your own commentary. Just summarize very carefully. Only include information that would be important for determining whether the tenant is a good fit for the rental property. Don't include anything about disclaimers or stuff like that. Here is the document: \n ",
+        file_content,
         temperature=0.0)
-        response_text = response.choices[0].message.content
-        response_text = response_text.replace('*', '\*').replace('_', '\_')
-        response_text = response_text.replace('\xa0', ' ')
-        response_text = response_text.replace('$', '\$')
-        if "youtube url" in document_type:
-            st.write(extract_url_from_txt(local_file_path))
-            bot.add(extract_url_from_txt(local_file_path))
-        else:
+    response_text = response_text.replace('*', '\*').replace('_', '\_')
+    response_text = response_text.replace('\xa0', ' ')
+    response_text = response_text.replace('$', '\$')
+    return response_text
+
+def _prepare_tenant_document(file, document_type, name):
+    """Download a tenant's extracted .txt document and return (text, summary); YouTube documents are not summarized"""
+    file_content = read_text_document(file['Key'])
+    if "youtube url" in document_type:
+        # The URL itself is embedded, there is nothing to summarize
+        return file_content.strip(), None
+    return file_content, summarize_tenant_document(file_content, document_type, name)
+
+def tenant_collection_name(address, tenant_name):
+    """Name of the Chroma collection that holds a tenant's embedded documents"""
+    digest = hashlib.sha1(f"{address}/{tenant_name}".encode('utf-8')).hexdigest()[:32]
+    return f"tenant-{digest}"
+
+def detect_document_changes(collection, files):
+    """
+    Diff a tenant's current .txt listing against what is embedded in its collection.
+    Returns (added, modified, deleted): listed files that are new, listed files whose ETag changed,
+    and S3 keys that are embedded but no longer listed.
+    """
+    embedded = bot_manifest.entries(collection)
+    listed_keys = {file['Key'] for file in files}
+    added = [file for file in files if file['Key'] not in embedded]
+    modified = [file for file in files if file['Key'] in embedded and embedded[file['Key']][0] != file.get('ETag')]
+    deleted = [key for key in embedded if key not in listed_keys]
+    return added, modified, deleted
+
+def refresh_bot(bot, selected_address, selected_tenant, max_workers=LLM_MAX_CONCURRENCY):
+    """
+    Bring a tenant bot's collection in line with S3: remove the chunks of deleted or replaced documents
+    and embed only new or replaced ones. Returns the number of added, modified and deleted documents.
+    """
+    collection = tenant_collection_name(selected_address, selected_tenant)
+    invalidate_listing_cache(f"{LISTINGS_FOLDER}{selected_address}/{selected_tenant}/")
+    files = get_files_for_tenant(selected_address, selected_tenant, only_text=True)
+    added, modified, deleted = detect_document_changes(collection, files)
+    changes = {'added': len(added), 'modified': len(modified), 'deleted': len(deleted)}
+
+    embedded = bot_manifest.entries(collection)
+    for key in deleted + [file['Key'] for file in modified]:
+        bot.db.delete({'hash': embedded[key][1]})
+        bot_manifest.remove(collection, key)
+
+    changed_keys = {file['Key'] for file in added + modified}
+    files = [file for file in files if file['Key'] in changed_keys]
+    if not files:
+        return changes
+    document_types = [metadata.get('document_type', '').lower() for metadata in get_metadata_for_files(files)]
+    name = selected_tenant.replace('_', ' ')  # This should be fetched dynamically
+
+    # Download and summarize concurrently; map keeps the results in file order so ingestion stays deterministic
+    documents = []
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(files)))) as executor:
+        prepared = executor.map(lambda args: _prepare_tenant_document(args[0], args[1], name), zip(files, document_types))
+
+        for file, document_type, (file_content, summary) in zip(files, document_types, prepared):
+            st.write(document_type)
+            if "youtube url" in document_type:
+                # Transcripts are fetched and chunked by embedchain's own loader
+                st.write(file_content)
+                source_hash = bot.add(file_content)
+                if source_hash:
+                    bot_manifest.put(collection, file['Key'], file.get('ETag', ''), source_hash)
+                continue
             data_type = determine_data_type(file['Key'])
-            if data_type:
-                try:
-                    print(response_text)
-                    bot.add(response_text, data_type)  # Pass the file content instead of the path
-                except Exception as e:
-                    st.warning(f"Error embedding {file['Key']}: {e}")
-            else:
+            if not data_type:
                 st.warning(f"Unsupported file type for {file['Key']}")
-    return bot
+                continue
+            documents.append({
+                's3_key': file['Key'],
+                'etag': file.get('ETag', ''),
+                'data_type': data_type,
+                'texts': {'summary': summary, 'text': file_content},
+            })
 
+    # Chunks of every document are embedded in batched requests and written to Chroma in bulk
+    etags = {document['s3_key']: document['etag'] for document in documents}
+    try:
+        source_hashes = ingest_documents(
+            bot.db.collection, documents,
+            embed=lambda texts: embed_texts(texts, model=bot.embedder.config.model or "text-embedding-ada-002"),
+            app_id=bot.config.id)
+    except Exception as e:
+        st.warning(f"Error embedding documents for {selected_tenant}: {e}")
+        return changes
+    for key, source_hash in source_hashes.items():
+        bot_manifest.put(collection, key, etags[key], source_hash)
+    return changes
 
-def display_pdf(file_data):
+@st.cache_resource
+def create_bot(selected_address, selected_tenant, max_workers=LLM_MAX_CONCURRENCY):
     """
-    Display a PDF in Streamlit.
-    
-    Parameters:
-    - file_data (bytes): PDF file data.
+    Attach a bot to the tenant's persistent collection in the Chroma store under db/
+    and embed whatever changed in S3 since the collection was last refreshed.
     """
-    # Encode the file data using base64 encoding
-    base64_pdf = base64.b64encode(file_data).decode('utf-8')
-    
-    # Embed the base64 encoded file in HTML iframe
-    pdf_display = f'<iframe src="data:application/pdf;base64,{base64_pdf}" width="800" height="800" type="application/pdf"></iframe>'
-    
-    # Use st.markdown to render the pdf document in Streamlit
-    st.markdown(pdf_display, unsafe_allow_html=True)
+    collection = tenant_collection_name(selected_address, selected_tenant)
+    bot = App(
+        config=AppConfig(id=collection),
+        db_config=ChromaDbConfig(collection_name=collection, dir='db'),
+        system_prompt=f"You are a tenant named {selected_tenant} who is interested in renting the unit at {selected_address}. You are currently being interviewed to determine if you are a good fit for the unit. You will be asked questions about the documents you have uploaded."
+    )
+    refresh_bot(bot, selected_address, selected_tenant, max_workers)
+    return bot
+
 
 def extract_categories_from_files(address, tenant_name):
     """Extract unique document categories from the list of files."""
     files = get_files_for_tenant(address, tenant_name)
 
     categories = set()
-    for file in files:
-        metadata = get_metadata_for_file(BUCKET_NAME, file['Key'])
+    for metadata in get_metadata_for_files(files):
         document_type = metadata.get('document_type', '').lower()
         # Split the file path and get the category (assuming the format is always consistent)
         categories.add(document_type)